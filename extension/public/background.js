@@ -29,9 +29,13 @@ console.log('Background script loaded');
 let ws = null;
 let reconnectAttempts = 0;
 const MAX_RECONNECT_ATTEMPTS = Infinity;
-let updateTimeout = null;
 let reconnectInterval = null;
 let isConnecting = false;
+// Per-connection sequence number for tabs_update / tab event messages sent to the server
+let ingestSeq = 0;
+let currentBrowserName = null;
+// Fields covered by the tab digest - must match DIGEST_FIELDS in tab_store.py
+const DIGEST_FIELDS = ['id', 'windowId', 'url', 'title', 'favIconUrl'];
 
 function connectWebSocket() {
     if (isConnecting) return;
@@ -51,12 +55,14 @@ function connectWebSocket() {
 
     ws = new WebSocket('ws://localhost:8765');
 
-    ws.onopen = () => {
+    ws.onopen = async () => {
         console.log('Connected to WebSocket server');
         reconnectAttempts = 0;
         clearInterval(reconnectInterval);
         reconnectInterval = null;
         isConnecting = false;
+        ingestSeq = 0;
+        currentBrowserName = await detectCurrentBrowser();
         sendCurrentTabs(); // Send tabs immediately upon connection
     };
 
@@ -82,12 +88,30 @@ function connectWebSocket() {
     ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
         if (data.type === 'activate_tab') {
-            chrome.tabs.update(data.tabId, { active: true });
-            chrome.windows.update(data.windowId, { focused: true });
+            activateTab(data);
+        } else if (data.type === 'resync_tabs') {
+            // Server missed an event or its digest disagrees with ours
+            sendCurrentTabs();
         }
     };
 }
 
+async function activateTab(data) {
+    let ok = true;
+    let error = null;
+    try {
+        await chrome.tabs.update(data.tabId, { active: true });
+    } catch (err) {
+        ok = false;
+        error = err.message;
+    }
+    // The server times each activation from the click to this ack
+    if (data.requestId !== undefined && ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ type: 'activate_ack', requestId: data.requestId, tabId: data.tabId, ok: ok, error: error }));
+    }
+    chrome.windows.update(data.windowId, { focused: true });
+}
+
 async function detectCurrentBrowser() {
   try {
     const extensionUrl = chrome.runtime.getURL('');
@@ -179,28 +203,46 @@ async function getIconDataUrl(favIconUrl) {
     }
 }
 
+function formatTab(tab) {
+    return {
+        id: tab.id,
+        title: tab.title,
+        url: tab.url,
+        favIconUrl: tab.favIconUrl,  // Use original URL directly
+        windowId: tab.windowId,
+        browser: currentBrowserName
+    };
+}
+
+// 32-bit FNV-1a over the UTF-16 code units of the digest fields (same as tab_digest in tab_store.py)
+function tabDigest(tab) {
+    const text = DIGEST_FIELDS.map(field => `${tab[field] ?? ''}`).join('|');
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        hash = Math.imul(hash ^ text.charCodeAt(i), 0x01000193) >>> 0;
+    }
+    return hash;
+}
+
+function sendIngestMessage(message) {
+    if (!ws || ws.readyState !== WebSocket.OPEN || !currentBrowserName) return;
+    message.browser = currentBrowserName;
+    message.seq = ++ingestSeq;
+    ws.send(JSON.stringify(message));
+}
+
 async function sendCurrentTabs() {
-    if (!ws || ws.readyState !== WebSocket.OPEN) return;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !currentBrowserName) return;
 
     try {
         const tabs = await chrome.tabs.query({});
-        const currentBrowser = await detectCurrentBrowser();
         
-        // Process tabs without logging errors
-        const formattedTabs = await Promise.all(tabs.map(async tab => ({
-            id: tab.id,
-            title: tab.title,
-            url: tab.url,
-            favIconUrl: tab.favIconUrl,  // Use original URL directly
-            windowId: tab.windowId,
-            browser: currentBrowser
-        })));
-
-        ws.send(JSON.stringify({
+        sendIngestMessage({
             type: 'tabs_update',
-            tabs: formattedTabs,
-            browser: currentBrowser
-        }));
+            tabs: tabs.map(formatTab),
+            // Lets the server tell which native window belongs to which windowId
+            activeTabs: tabs.filter(tab => tab.active).map(tab => tab.id)
+        });
     } catch (error) {
         // Only log critical errors
         if (error.message !== 'Failed to fetch') {
@@ -209,11 +251,63 @@ async function sendCurrentTabs() {
     }
 }
 
-function debouncedSendTabs() {
-  if (updateTimeout) {
-    clearTimeout(updateTimeout);
-  }
-  updateTimeout = setTimeout(sendCurrentTabs, 1000);
+// Periodically send a cheap digest of all tabs; the server asks for a full list only if it disagrees
+async function sendTabsDigest() {
+    if (!ws || ws.readyState !== WebSocket.OPEN || !currentBrowserName || ingestSeq === 0) return;
+
+    try {
+        const tabs = await chrome.tabs.query({});
+        let digest = 0;
+        tabs.forEach(tab => {
+            digest = (digest + tabDigest(formatTab(tab))) >>> 0;
+        });
+        ws.send(JSON.stringify({
+            type: 'tabs_digest',
+            browser: currentBrowserName,
+            seq: ingestSeq,
+            count: tabs.length,
+            digest: digest
+        }));
+    } catch (error) {
+        console.error('Error sending tab digest:', error);
+    }
+}
+
+function onTabCreated(tab) {
+    sendIngestMessage({ type: 'tab_created', tab: formatTab(tab) });
+}
+
+function onTabRemoved(tabId) {
+    sendIngestMessage({ type: 'tab_removed', tabId: tabId });
+}
+
+function onTabUpdated(tabId, changeInfo, tab) {
+    const fields = {};
+    ['title', 'url', 'favIconUrl'].forEach(field => {
+        if (field in changeInfo) {
+            fields[field] = tab[field];
+        }
+    });
+    if (Object.keys(fields).length > 0) {
+        sendIngestMessage({ type: 'tab_updated', tabId: tabId, fields: fields });
+    }
+}
+
+function onTabActivated(activeInfo) {
+    sendIngestMessage({ type: 'tab_activated', tabId: activeInfo.tabId, windowId: activeInfo.windowId });
+}
+
+function onTabAttached(tabId, attachInfo) {
+    sendIngestMessage({ type: 'tab_updated', tabId: tabId, fields: { windowId: attachInfo.newWindowId } });
+}
+
+async function onTabReplaced(addedTabId, removedTabId) {
+    onTabRemoved(removedTabId);
+    try {
+        onTabCreated(await chrome.tabs.get(addedTabId));
+    } catch (error) {
+        sendCurrentTabs();
+    }
 }
 
 // Connect to WebSocket server immediately when the background script loads
@@ -226,18 +320,16 @@ setInterval(() => {
     }
 }, 1000);
 
-// Update tabs every 5 seconds if connected (reduced from 10 seconds)
-setInterval(() => {
-    if (ws && ws.readyState === WebSocket.OPEN) {
-        debouncedSendTabs();
-    }
-}, 5000);
+// Verify the server's copy of our tabs every 5 seconds if connected
+setInterval(sendTabsDigest, 5000);
 
-// Listen for tab changes
-chrome.tabs.onCreated.addListener(debouncedSendTabs);
-chrome.tabs.onRemoved.addListener(debouncedSendTabs);
-chrome.tabs.onUpdated.addListener(debouncedSendTabs);
-chrome.tabs.onMoved.addListener(debouncedSendTabs);
+// Stream tab changes to the server as individual events
+chrome.tabs.onCreated.addListener(onTabCreated);
+chrome.tabs.onRemoved.addListener(onTabRemoved);
+chrome.tabs.onUpdated.addListener(onTabUpdated);
+chrome.tabs.onActivated.addListener(onTabActivated);
+chrome.tabs.onAttached.addListener(onTabAttached);
+chrome.tabs.onReplaced.addListener(onTabReplaced);
 
 // Add listener for extension startup
 chrome.runtime.onStartup.addListener(() => {
@@ -7,7 +7,9 @@ const fallbackIcon = '/fallback.svg';
 
 function App() {
   const [tabs, setTabs] = useState([]);
+  // favIconUrl -> whether the icon is mostly white; the server sends what it has analyzed already
   const [whiteIcons, setWhiteIcons] = useState({});
+  const analyzedIcons = useRef(new Set());
   const [wsConnected, setWsConnected] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
   const canvasRef = useRef(document.createElement('canvas'));
@@ -85,6 +87,14 @@ function App() {
 
   const handleWebSocketMessage = (event) => {
     const data = JSON.parse(event.data);
+    if (data.icons) {
+      const known = {};
+      Object.entries(data.icons).forEach(([url, info]) => {
+        analyzedIcons.current.add(url);
+        known[url] = info.white;
+      });
+      setWhiteIcons(prev => ({ ...prev, ...known }));
+    }
     if (data.type === 'tabs_update') {
       const currentBrowser = getCurrentBrowser();
       // Only update tabs if they're from the same browser
@@ -227,7 +237,9 @@ function App() {
     console.log(`Analyzing ${tabs.length} tabs`);
     
     tabs.forEach(tab => {
-      if (!tab.favIconUrl) return;
+      // Each icon is analyzed once, not again on every tab change
+      if (!tab.favIconUrl || analyzedIcons.current.has(tab.favIconUrl)) return;
+      analyzedIcons.current.add(tab.favIconUrl);
 
       // Create a hidden image element
       const img = new Image();
@@ -244,7 +256,7 @@ function App() {
         const isWhite = isIconWhite(img, tab.favIconUrl);
         setWhiteIcons(prev => ({
           ...prev,
-          [tab.id]: isWhite
+          [tab.favIconUrl]: isWhite
         }));
         // Restore console.error
         console.error = originalConsoleError;
@@ -253,7 +265,7 @@ function App() {
       img.onerror = () => {
         setWhiteIcons(prev => ({
           ...prev,
-          [tab.id]: false
+          [tab.favIconUrl]: false
         }));
         // Restore console.error
         console.error = originalConsoleError;
@@ -266,7 +278,7 @@ function App() {
         // Silently handle any errors
         setWhiteIcons(prev => ({
           ...prev,
-          [tab.id]: false
+          [tab.favIconUrl]: false
         }));
       }
     });
@@ -343,7 +355,7 @@ function App() {
 
       <div className="tab-grid">
         {filteredTabs.map((tab) => {
-          const isWhite = whiteIcons[tab.id];
+          const isWhite = whiteIcons[tab.favIconUrl];
           console.log(`Rendering ${tab.title} - isWhite: ${isWhite}`);
           
           return (
@@ -373,7 +385,9 @@ function App() {
 function highlightMatchingText(text, query) {
   if (!query) return text;
   
-  const parts = text.split(new RegExp(`(${query})`, 'gi'));
+  // Escape the raw input so characters like ( or + are matched literally instead of breaking the RegExp
+  const escaped = query.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+  const parts = text.split(new RegExp(`(${escaped})`, 'gi'));
   return parts.map((part, i) => 
     part.toLowerCase() === query.toLowerCase() ? 
       <span key={i} className="highlight">{part}</span> : 
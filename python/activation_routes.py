@@ -0,0 +1,110 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import itertools
+import time
+from collections import deque
+
+class ActivationRoutes:
+    """Times tab activations per route, from the click to the extension's ack.
+
+    A route is the browser whose connection received the activate_tab. The
+    server stamps each relayed activation with a requestId and the owning
+    extension answers with activate_ack once chrome.tabs.update settled, so
+    the latency covers the relay queue, the extension and the tab switch
+    itself. Extensions that never ack (older builds) show up as expired.
+    """
+
+    def __init__(self, ack_timeout=10.0, samples=200):
+        self.ack_timeout = ack_timeout
+        self.samples = samples
+        self._ids = itertools.count(1)
+        # requestId -> (route, requesting websocket, start time)
+        self._pending = {}
+        # route -> counters plus the most recent latencies
+        self._routes = {}
+
+    def _route(self, route):
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = {
+                "sent": 0, "acked": 0, "failed": 0, "expired": 0,
+                "latencies": deque(maxlen=self.samples),
+            }
+        return stats
+
+    def start(self, route, requester, start_time=None):
+        """Record an activation relayed to route and return the requestId to stamp it with"""
+        self.expire()
+        request_id = next(self._ids)
+        self._pending[request_id] = (route, requester, start_time or time.perf_counter())
+        self._route(route)["sent"] += 1
+        return request_id
+
+    def ack(self, request_id, ok=True):
+        """Close a pending activation; returns (route, requester, latency ms) or None if unknown"""
+        pending = self._pending.pop(request_id, None)
+        if pending is None:
+            return None
+        route, requester, start_time = pending
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        stats = self._route(route)
+        if ok:
+            stats["acked"] += 1
+            stats["latencies"].append(latency_ms)
+        else:
+            stats["failed"] += 1
+        return route, requester, latency_ms
+
+    def expire(self):
+        """Give up on activations that were never acknowledged"""
+        deadline = time.perf_counter() - self.ack_timeout
+        for request_id in [request_id for request_id, (_, _, start_time) in self._pending.items()
+                           if start_time < deadline]:
+            route = self._pending.pop(request_id)[0]
+            self._route(route)["expired"] += 1
+
+    def forget_requester(self, requester):
+        """Drop the requester of pending activations whose popup went away; the timing still counts"""
+        for request_id, (route, other, start_time) in list(self._pending.items()):
+            if other is requester:
+                self._pending[request_id] = (route, None, start_time)
+
+    def stats(self):
+        self.expire()
+        routes = {}
+        for route, stats in self._routes.items():
+            latencies = sorted(stats["latencies"])
+            routes[route] = {
+                "sent": stats["sent"],
+                "acked": stats["acked"],
+                "failed": stats["failed"],
+                "expired": stats["expired"],
+                "p50_ms": round(latencies[len(latencies) // 2], 2) if latencies else None,
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else None,
+                "max_ms": round(latencies[-1], 2) if latencies else None,
+            }
+        return {"pending": len(self._pending), "routes": routes}
@@ -0,0 +1,430 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+#!/usr/bin/env python3
+"""Headless benchmarks for the FindYourTab server internals.
+
+Run from the python/ directory, e.g.:
+    python benchmark.py memory
+    python benchmark.py memory --sizes 1000 10000 50000
+    python benchmark.py codecs
+    python benchmark.py activation --windows 50 500 2000
+    python benchmark.py search --sizes 1000 10000
+    python benchmark.py favicons --icons 120 --slow-ms 1000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+from tab_search import SearchIndex
+from tab_store import TabRecord, TabStore, tab_key
+import window_backends
+import wire_codecs
+
+BROWSERS = ['Chrome', 'Firefox', 'Edge', 'Brave']
+
+def make_tabs(count, seed=0):
+    """Realistic-looking tab payloads as the extension sends them.
+
+    Tabs are spread over a few browsers and windows, and many tabs share a
+    site, so domains and favicon URLs repeat the way they do for real users.
+    Returns {browser: json text of its tabs_update message}.
+    """
+    rng = random.Random(seed)
+    sites = [f"site{i}.example.com" for i in range(max(1, count // 8))]
+    words = ['Inbox', 'Pull request', 'Docs', 'Search results', 'Dashboard', 'Issue', 'Video', 'Article']
+    per_browser = {browser: [] for browser in BROWSERS}
+    for tab_id in range(count):
+        browser = BROWSERS[tab_id % len(BROWSERS)]
+        site = rng.choice(sites)
+        per_browser[browser].append({
+            'id': 1000 + tab_id,
+            'title': f"{rng.choice(words)} {tab_id} - {site}",
+            'url': f"https://www.{site}/path/{tab_id}?q={rng.randrange(10 ** 6)}",
+            'favIconUrl': f"https://www.{site}/favicon.ico",
+            'windowId': 1_000_000 + rng.randrange(max(1, count // 40)),
+            'browser': browser,
+        })
+    return {
+        browser: json.dumps({'type': 'tabs_update', 'browser': browser, 'tabs': tabs})
+        for browser, tabs in per_browser.items()
+    }
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used, result
+
+def bench_memory(args):
+    print(f"{'tabs':>8} {'dicts B/tab':>12} {'records B/tab':>14} {'store B/tab':>12}")
+    for size in args.sizes:
+        payloads = make_tabs(size)
+
+        def build_dicts():
+            # What the server used to keep: the json.loads() dicts plus the keys it added
+            browser_tabs = {}
+            for browser, payload in payloads.items():
+                tabs = json.loads(payload)['tabs']
+                for tab in tabs:
+                    tab['browser'] = browser
+                    tab['key'] = tab_key(browser, tab['id'])
+                browser_tabs[browser] = tabs
+            return browser_tabs
+
+        def build_records():
+            # The same tabs as interned TabRecords, without any of the store indexes
+            interning = TabStore()
+            records = []
+            for browser, payload in payloads.items():
+                for tab in json.loads(payload)['tabs']:
+                    record = TabRecord(sys.intern(browser), tab['id'])
+                    interning._set_fields(record, tab)
+                    records.append(record)
+            return records
+
+        def build_store():
+            store = TabStore()
+            for browser, payload in payloads.items():
+                store.replace_browser(browser, json.loads(payload)['tabs'])
+            return store
+
+        dict_bytes, _ = _measure(build_dicts)
+        record_bytes, _ = _measure(build_records)
+        store_bytes, _ = _measure(build_store)
+        print(f"{size:>8} {dict_bytes / size:>12.0f} {record_bytes / size:>14.0f} {store_bytes / size:>12.0f}")
+
+def _deflate(frame, window_bits, settings):
+    """Compress one message the way permessage-deflate does; returns (bytes on the wire, ms)"""
+    data = frame.encode('utf-8') if isinstance(frame, str) else frame
+    start = time.perf_counter()
+    compressor = zlib.compressobj(wbits=-window_bits, **settings)
+    size = len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return size, (time.perf_counter() - start) * 1000
+
+def _time_per_call(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+def bench_codecs(args):
+    codecs = [wire_codecs.StdlibJsonCodec()]
+    if wire_codecs.orjson is not None:
+        codecs.append(wire_codecs.OrjsonCodec())
+    if wire_codecs.msgpack is not None:
+        codecs.append(wire_codecs.MsgpackCodec())
+    deflate_configs = [
+        ('websockets default', 12, {"memLevel": 5}),
+        ('tuned', wire_codecs.DEFLATE_WINDOW_BITS, wire_codecs.DEFLATE_COMPRESS_SETTINGS),
+    ]
+
+    print(f"{'tabs':>6} {'codec':<12} {'encode ms':>10} {'decode ms':>10} {'raw KB':>8} "
+          + " ".join(f"{name:>26}" for name, _, _ in deflate_configs))
+    for size in args.sizes:
+        store = TabStore()
+        for browser, payload in make_tabs(size).items():
+            store.replace_browser(browser, json.loads(payload)['tabs'])
+        snapshot = {
+            "type": "tabs_update",
+            "seq": 1,
+            "tabs": [record.to_dict() for record in store.all_tabs()],
+            "browsers": store.browsers(),
+        }
+        repeat = max(3, 20000 // size)
+        for codec in codecs:
+            frame = codec.encode(snapshot)
+            encode_ms = _time_per_call(codec.encode, snapshot, repeat) * 1000
+            decode_ms = _time_per_call(codec.decode, frame, repeat) * 1000
+            raw = len(frame.encode('utf-8') if isinstance(frame, str) else frame)
+            label = codec.__class__.__name__.replace('Codec', '').lower()
+            deflated = []
+            for _, bits, settings in deflate_configs:
+                wire_bytes, deflate_ms = _deflate(frame, bits, settings)
+                deflated.append(f"{wire_bytes / 1024:>12.1f} KB {deflate_ms:>7.2f} ms")
+            print(f"{size:>6} {label:<12} {encode_ms:>10.2f} {decode_ms:>10.2f} {raw / 1024:>8.1f} "
+                  + " ".join(deflated))
+
+def _median_ms(samples):
+    return sorted(samples)[len(samples) // 2] * 1000
+
+async def _activate(server, backend, browser, tab_id, cold):
+    """One popup click: returns (event loop ms, click-to-foreground ms)"""
+    import websocket_server
+    if cold:
+        websocket_server.window_registry.invalidate()
+    backend.foreground = None
+    message = json.dumps({'type': 'activate_tab', 'tabId': tab_id, 'windowId': 1, 'browser': browser})
+    start = time.perf_counter()
+    await server.handle_message(None, message)
+    loop_time = time.perf_counter() - start
+    while backend.foreground is None:
+        await asyncio.sleep(0.0001)
+    return loop_time, time.perf_counter() - start
+
+def bench_activation(args):
+    # Importing the server only after the backend is set keeps the run headless on every platform
+    import websocket_server
+
+    print(f"{'windows':>8} {'mode':<6} {'loop ms':>8} {'focus ms':>9} {'enumerations':>13}")
+    for other_windows in args.windows:
+        backend = window_backends.SimulatedBackend(
+            {browser: args.browser_windows for browser in BROWSERS},
+            other_windows=other_windows,
+            enumerate_latency=args.enumerate_us / 1e6,
+            focus_latency=args.focus_ms / 1000,
+        )
+        window_backends.set_window_backend(backend)
+        websocket_server.window_registry = websocket_server.WindowRegistry(backend=backend)
+
+        async def run():
+            server = websocket_server.TabWebSocketServer()
+            # make_tabs() deals tab 1000 + i to BROWSERS[i % len(BROWSERS)], as _activate() asks for it
+            for browser, payload in make_tabs(args.repeat).items():
+                server.store.replace_browser(browser, json.loads(payload)['tabs'])
+            results = {}
+            for mode in ('cold', 'warm'):
+                loop_times, focus_times = [], []
+                enumerations = backend.enumerations
+                for i in range(args.repeat):
+                    loop_time, focus_time = await _activate(
+                        server, backend, BROWSERS[i % len(BROWSERS)], 1000 + i, mode == 'cold')
+                    loop_times.append(loop_time)
+                    focus_times.append(focus_time)
+                results[mode] = (loop_times, focus_times, backend.enumerations - enumerations)
+            server.focus_worker.stop()
+            return results
+
+        # The focus path logs every step; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(run())
+        for mode, (loop_times, focus_times, enumerations) in results.items():
+            print(f"{other_windows:>8} {mode:<6} {_median_ms(loop_times):>8.3f} "
+                  f"{_median_ms(focus_times):>9.3f} {enumerations:>13}")
+
+# Typed the way people search: a letter, a partial word, words in any order, typos
+SEARCH_QUERIES = ['i', 'do', 'inbox', 'pull req', 'site12', 'site12 docs', 'path 1234',
+                  'dashbord', 'exampel', 'nothing matches this']
+
+def bench_search(args):
+    print(f"{'tabs':>8} {'index ms/tab':>13} {'query':<22} {'median ms':>10} {'max ms':>8} {'results':>8}")
+    for size in args.sizes:
+        payloads = make_tabs(size)
+        store = TabStore()
+        index = SearchIndex(store)
+        start = time.perf_counter()
+        for browser, payload in payloads.items():
+            store.replace_browser(browser, json.loads(payload)['tabs'])
+        # Includes the store itself; see the memory subcommand for that part alone
+        index_ms = (time.perf_counter() - start) * 1000 / size
+        for query in SEARCH_QUERIES:
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = index.search(query, args.limit)
+                samples.append(time.perf_counter() - start)
+            print(f"{size:>8} {index_ms:>13.3f} {query:<22} {_median_ms(samples):>10.3f} "
+                  f"{max(samples) * 1000:>8.3f} {len(results):>8}")
+
+class _StubOrigin(ThreadingHTTPServer):
+    """Local icon host that answers every GET after a fixed delay, with keep-alive"""
+
+    daemon_threads = True
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), _StubIconHandler)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+class _StubIconHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server._lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        body = self.path.encode() * 20
+        self.send_response(200)
+        self.send_header('Content-type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _urllib_fetch(url, etag=None, last_modified=None):
+    """How the proxy fetched icons before FaviconFetcher: a new urllib connection per icon"""
+    from favicon_fetcher import FETCH_HEADERS
+    request = urllib.request.Request(url, headers=FETCH_HEADERS)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.headers.get('Content-type', 'image/x-icon'), response.read(), None, None
+
+def bench_favicons(args):
+    import favicon_cache
+    import favicon_store
+    import http_server
+
+    class QuietHandler(http_server.ExtensionHandler):
+        def log_message(self, format, *args):
+            pass
+
+    origins = [_StubOrigin(args.latency_ms / 1000) for _ in range(args.hosts - 1)]
+    origins.append(_StubOrigin(args.slow_ms / 1000))
+    for origin in origins:
+        threading.Thread(target=origin.serve_forever, daemon=True).start()
+    # Icon i lives on host i % hosts, so every host (the slow one last) serves its share
+    icons = [f"{origins[i % len(origins)].base_url}/icon{i}.png" for i in range(args.icons)]
+    # Every icon is asked for by several tabs at once, as when the popup opens
+    requests = [url for url in icons for _ in range(args.duplicates)]
+    random.Random(0).shuffle(requests)
+    slow_base = origins[-1].base_url
+
+    print(f"{'mode':<8} {'total ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'fast max ms':>12} "
+          f"{'origin reqs':>12} {'connections':>12}")
+    for mode in ('serial', 'pooled', 'bundle'):
+        directory = tempfile.mkdtemp(prefix='findyourtab-bench-')
+        for origin in origins:
+            origin.requests = origin.connections = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = favicon_store.FaviconStore(directory, fetch=_urllib_fetch if mode == 'serial' else None)
+        favicon_store.set_favicon_store(store)
+        QuietHandler.favicon_cache = favicon_cache.FaviconCache()
+        if mode == 'serial':
+            proxy = HTTPServer(('127.0.0.1', 0), QuietHandler)
+        else:
+            proxy = http_server.PooledHTTPServer(('127.0.0.1', 0), QuietHandler)
+        threading.Thread(target=proxy.serve_forever, daemon=True).start()
+        proxy_url = f"http://127.0.0.1:{proxy.server_port}/proxy-favicon?url="
+        bundle_url = f"http://127.0.0.1:{proxy.server_port}/favicon-bundle"
+
+        def get(url):
+            start = time.perf_counter()
+            with urllib.request.urlopen(proxy_url + urllib.parse.quote(url, safe=''), timeout=60) as response:
+                response.read()
+            return url, time.perf_counter() - start
+
+        def get_bundle(urls):
+            # The popup asks once for every distinct icon it renders; each icon arrives with the whole response
+            body = json.dumps({"urls": urls}).encode()
+            request = urllib.request.Request(bundle_url, data=body, headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            return [(url, time.perf_counter() - start) for url in urls]
+
+        start = time.perf_counter()
+        if mode == 'bundle':
+            results = get_bundle(list(dict.fromkeys(requests)))
+        else:
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                results = list(pool.map(get, requests))
+        total = time.perf_counter() - start
+        proxy.shutdown()
+        proxy.server_close()
+        if store.fetcher is not None:
+            store.fetcher.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+        latencies = sorted(latency for _, latency in results)
+        fast = [latency for url, latency in results if not url.startswith(slow_base)]
+        print(f"{mode:<8} {total * 1000:>9.0f} {_median_ms(latencies):>8.1f} "
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.1f} {max(fast) * 1000:>12.1f} "
+              f"{sum(origin.requests for origin in origins):>12} {sum(origin.connections for origin in origins):>12}")
+    for origin in origins:
+        origin.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="FindYourTab server benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    memory = subparsers.add_parser('memory', help="bytes per tab: raw dicts vs TabRecords vs the indexed TabStore")
+    memory.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    memory.set_defaults(func=bench_memory)
+
+    codecs = subparsers.add_parser('codecs', help="snapshot encode/decode time and bytes on the wire per codec")
+    codecs.add_argument('--sizes', type=int, nargs='+', default=[100, 600, 5000])
+    codecs.set_defaults(func=bench_codecs)
+
+    activation = subparsers.add_parser('activation', help="tab activation latency against a simulated desktop")
+    activation.add_argument('--windows', type=int, nargs='+', default=[50, 500, 2000],
+                            help="unrelated top-level windows the enumeration has to skip")
+    activation.add_argument('--browser-windows', type=int, default=2, help="windows per browser")
+    activation.add_argument('--enumerate-us', type=float, default=20, help="simulated EnumWindows cost per window")
+    activation.add_argument('--focus-ms', type=float, default=2, help="simulated SetForegroundWindow cost")
+    activation.add_argument('--repeat', type=int, default=40)
+    activation.set_defaults(func=bench_activation)
+
+    search = subparsers.add_parser('search', help="search index build cost and query latency")
+    search.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--repeat', type=int, default=50)
+    search.set_defaults(func=bench_search)
+
+    favicons = subparsers.add_parser('favicons', help="favicon proxy: serial urllib fetches vs the pooled, coalescing proxy vs one bundle request")
+    favicons.add_argument('--icons', type=int, default=120, help="distinct icon URLs")
+    favicons.add_argument('--hosts', type=int, default=6, help="icon hosts; the last one is slow")
+    favicons.add_argument('--duplicates', type=int, default=3, help="simultaneous requests per icon")
+    favicons.add_argument('--clients', type=int, default=24, help="concurrent popup requests")
+    favicons.add_argument('--latency-ms', type=float, default=20, help="response delay of the normal hosts")
+    favicons.add_argument('--slow-ms', type=float, default=1000, help="response delay of the slow host")
+    favicons.set_defaults(func=bench_favicons)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
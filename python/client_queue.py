@@ -0,0 +1,210 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+from websockets.exceptions import ConnectionClosed
+
+from wire_codecs import JSON_CODEC
+
+# Queue item kinds
+MESSAGE = 'message'    # must be delivered as-is (activation relays, query results, ...)
+PATCH = 'patch'        # tabs_patch; can be replaced by a snapshot if the client falls behind
+SNAPSHOT = 'snapshot'  # encoded at send time so the client always gets the latest state
+CODEC = 'codec'        # switch encoding for everything queued after this point
+VIEWPORT = 'viewport'  # built at send time from the client's viewport subscription; at most one queued
+
+class ClientQueue:
+    """Bounded outbound queue with its own sender task for one websocket client.
+
+    Producers never await a client: put_*() only appends to the queue. Each
+    client drains its queue in its own task, so a slow or suspended client
+    can only delay itself. Pending patches collapse into a single snapshot
+    when the queue fills up or a newer snapshot is queued ("latest snapshot
+    wins"). A client whose send stalls for send_timeout, or whose queue stays
+    full of messages that can't be collapsed, is disconnected as a slow
+    consumer.
+
+    Queued messages are OutgoingMessage objects and are encoded with the
+    client's codec when they are sent, so a message broadcast to many clients
+    is encoded once per codec rather than once per client.
+
+    Clients with a viewport subscription get viewport updates instead of
+    patches. Like snapshots they are built when they are sent, from the
+    state at that moment, so however many changes happen while the client is
+    busy it only ever has one update queued.
+    """
+
+    def __init__(self, websocket, snapshot_frame, max_queue=64, send_timeout=5.0, viewport_frame=None):
+        self.websocket = websocket
+        # Callable taking a codec and returning the current encoded snapshot
+        self._snapshot_frame = snapshot_frame
+        # Callable taking a codec and returning the encoded viewport update, or None if there is none
+        self._viewport_frame = viewport_frame
+        self._viewport_queued = False
+        # Codec for frames sent from now on; see switch_codec()
+        self.codec = JSON_CODEC
+        # Codec negotiated with the client, applied once the CODEC marker is sent
+        self.pending_codec = JSON_CODEC
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self._items = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.closed = False
+        self.slow = False
+        # Counters exposed through TabWebSocketServer.queue_stats()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.logger = logging.getLogger('WebSocketServer')
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "slow": self.slow,
+        }
+
+    def put(self, message):
+        self._append(MESSAGE, message)
+
+    def put_patch(self, message):
+        if len(self._items) >= self.max_queue:
+            self._collapse_patches()
+        self._append(PATCH, message)
+
+    def put_viewport(self):
+        if not self._viewport_queued:
+            self._viewport_queued = True
+            self._append(VIEWPORT, None)
+
+    def switch_codec(self, codec):
+        """Encode everything queued after this call with codec; earlier items keep the old one"""
+        self.pending_codec = codec
+        self._append(CODEC, codec)
+
+    def put_snapshot(self):
+        self._collapse_patches()
+
+    def _collapse_patches(self):
+        """Replace every queued patch and snapshot with one snapshot at the end of the queue"""
+        kept = deque(item for item in self._items if item[0] in (MESSAGE, CODEC, VIEWPORT))
+        dropped = len(self._items) - len(kept)
+        if dropped:
+            self.dropped += dropped
+            self.coalesced += 1
+        self._items = kept
+        self._append(SNAPSHOT, None)
+
+    def _append(self, kind, item):
+        if self.closed:
+            return
+        if len(self._items) >= self.max_queue:
+            # Only undroppable messages left and still no room - the client isn't keeping up
+            self.dropped += 1
+            self.disconnect_slow("send queue full")
+            return
+        self._items.append((kind, item))
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._wakeup.set()
+
+    def disconnect_slow(self, reason):
+        if self.closed:
+            return
+        self.closed = True
+        self.slow = True
+        self._items.clear()
+        self.logger.warning(f"Disconnecting slow client: {reason}")
+        print(f"Disconnecting slow client: {reason}")
+        asyncio.ensure_future(self._close(1013, "slow consumer"))
+
+    def disconnect_failed(self):
+        """Close the socket after the sender hit an unexpected error; the client reconnects and resyncs"""
+        if self.closed:
+            return
+        self.closed = True
+        self._items.clear()
+        self.logger.exception("Client sender failed, disconnecting client")
+        print("Client sender failed, disconnecting client")
+        asyncio.ensure_future(self._close(1011, "internal error"))
+
+    async def _close(self, code, reason):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while not self.closed:
+            if not self._items:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            kind, item = self._items.popleft()
+            if kind == CODEC:
+                self.codec = item
+                continue
+            try:
+                if kind == VIEWPORT:
+                    self._viewport_queued = False
+                    frame = self._viewport_frame(self.codec)
+                    if frame is None:
+                        continue
+                elif kind == SNAPSHOT:
+                    frame = self._snapshot_frame(self.codec)
+                else:
+                    frame = item.frame(self.codec)
+                await asyncio.wait_for(self.websocket.send(frame), self.send_timeout)
+            except asyncio.TimeoutError:
+                self.disconnect_slow(f"send took longer than {self.send_timeout}s")
+                return
+            except ConnectionClosed:
+                self.closed = True
+                return
+            except Exception:
+                # Anything else would end this task silently and leave the client registered but deaf
+                self.disconnect_failed()
+                return
+            self.sent += 1
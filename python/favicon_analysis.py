@@ -0,0 +1,334 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import struct
+import zlib
+from collections import Counter
+
+# Pillow decodes every format when installed; without it PNG, BMP and ICO are decoded here
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Same thresholds the popup used: an icon is white when > 90% of its visible pixels are near-white
+WHITE_LEVEL = 245
+WHITE_SHARE = 0.9
+
+# Decoding icons larger than this (per side) costs more than the answer is worth
+MAX_SIDE = 256
+
+# Normalized variants the popup asks for: 16px, and 32px for high-DPI screens
+VARIANT_SIZES = (16, 32)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+def decode_png(data):
+    """(width, height, RGBA bytes) of a non-interlaced PNG, or None"""
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    pos = len(PNG_SIGNATURE)
+    header, palette, transparency, idat = None, None, None, []
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif kind == b'PLTE':
+            palette = chunk
+        elif kind == b'tRNS':
+            transparency = chunk
+        elif kind == b'IDAT':
+            idat.append(chunk)
+        elif kind == b'IEND':
+            break
+    if header is None:
+        return None
+    width, height, depth, color_type, _, _, interlace = header
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+    if channels is None or interlace or depth not in (1, 2, 4, 8, 16) or max(width, height) > MAX_SIDE:
+        return None
+    raw = zlib.decompress(b''.join(idat))
+    bits = channels * depth
+    stride = (width * bits + 7) // 8
+    step = max(1, bits // 8)
+    rows = []
+    previous = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        kind = raw[pos]
+        row = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if kind == 1:
+            for i in range(step, stride):
+                row[i] = (row[i] + row[i - step]) & 0xff
+        elif kind == 2:
+            for i in range(stride):
+                row[i] = (row[i] + previous[i]) & 0xff
+        elif kind == 3:
+            for i in range(stride):
+                row[i] = (row[i] + ((row[i - step] if i >= step else 0) + previous[i]) // 2) & 0xff
+        elif kind == 4:
+            for i in range(stride):
+                left = row[i - step] if i >= step else 0
+                upper_left = previous[i - step] if i >= step else 0
+                row[i] = (row[i] + _paeth(left, previous[i], upper_left)) & 0xff
+        rows.append(row)
+        previous = row
+
+    pixels = bytearray()
+    for row in rows:
+        if depth < 8:
+            # Unpack 1/2/4-bit samples (gray or palette), most significant bits first
+            per_byte = 8 // depth
+            mask = (1 << depth) - 1
+            samples = [(byte >> (8 - depth * (k + 1))) & mask for byte in row for k in range(per_byte)][:width]
+            if color_type == 0:
+                samples = [sample * 255 // mask for sample in samples]
+        else:
+            samples = row[::2] if depth == 16 else row
+        if color_type == 3:
+            for index in samples:
+                alpha = transparency[index] if transparency and index < len(transparency) else 255
+                pixels += palette[index * 3:index * 3 + 3] + bytes((alpha,))
+        elif color_type == 0:
+            for gray in samples:
+                pixels += bytes((gray, gray, gray, 255))
+        elif color_type == 4:
+            for i in range(0, len(samples), 2):
+                pixels += bytes((samples[i], samples[i], samples[i], samples[i + 1]))
+        elif color_type == 2:
+            for i in range(0, len(samples), 3):
+                pixels += bytes(samples[i:i + 3]) + b'\xff'
+        else:
+            pixels += samples
+    return width, height, bytes(pixels)
+
+def decode_bmp(data, height=None):
+    """(width, height, RGBA bytes) of a DIB as stored inside an ICO (32, 24 or 8 bit), or None"""
+    header_size, width, dib_height, _, bpp = struct.unpack('<IiiHH', data[:16])
+    # Inside an ICO the DIB height covers the colour rows and the AND mask
+    height = height or abs(dib_height) // 2
+    if width <= 0 or height <= 0 or max(width, height) > MAX_SIDE or bpp not in (8, 24, 32):
+        return None
+    colors = struct.unpack('<I', data[32:36])[0] or (256 if bpp == 8 else 0)
+    palette = data[header_size:header_size + colors * 4]
+    pos = header_size + colors * 4
+    stride = (width * bpp + 31) // 32 * 4
+    mask_stride = (width + 31) // 32 * 4
+    mask_pos = pos + stride * height
+    rows = []
+    for y in range(height):
+        row = data[pos + y * stride:pos + (y + 1) * stride]
+        mask = data[mask_pos + y * mask_stride:mask_pos + (y + 1) * mask_stride]
+        pixels = bytearray()
+        for x in range(width):
+            if bpp == 32:
+                b, g, r, a = row[x * 4:x * 4 + 4]
+            else:
+                if bpp == 24:
+                    b, g, r = row[x * 3:x * 3 + 3]
+                else:
+                    b, g, r = palette[row[x] * 4:row[x] * 4 + 3]
+                # Older icons have no alpha channel; the AND mask marks transparent pixels
+                a = 0 if mask and mask[x // 8] >> (7 - x % 8) & 1 else 255
+            pixels += bytes((r, g, b, a))
+        rows.append(pixels)
+    # DIB rows run bottom-up
+    return width, height, b''.join(reversed(rows))
+
+def _frame_order(width, size):
+    """Sort key for picking a frame to show at size: the smallest that is big enough, else the biggest"""
+    return (width < size, width if width >= size else -width)
+
+def decode_ico(data, size=16):
+    """(width, height, RGBA bytes) of the best image in an ICO for drawing at size, or None"""
+    if len(data) < 6 or data[:4] != b'\x00\x00\x01\x00':
+        return None
+    count = struct.unpack('<H', data[4:6])[0]
+    entries = []
+    for i in range(count):
+        width, height, _, _, _, _, length, offset = struct.unpack('<BBBBHHII', data[6 + i * 16:22 + i * 16])
+        entries.append((width or 256, height or 256, length, offset))
+    entries.sort(key=lambda entry: _frame_order(entry[0], size))
+    for width, height, length, offset in entries:
+        image = data[offset:offset + length]
+        decoded = decode_png(image) if image.startswith(PNG_SIGNATURE) else decode_bmp(image, height)
+        if decoded is not None:
+            return decoded
+    return None
+
+def decode_icon(data, content_type=None, size=16):
+    """(width, height, RGBA bytes) of an icon, or None if it can't be decoded (e.g. SVG).
+
+    For multi-resolution ICOs the frame that suits drawing at size is used.
+    """
+    try:
+        if Image is not None:
+            with Image.open(io.BytesIO(data)) as image:
+                sizes = image.info.get('sizes') if image.format == 'ICO' else None
+                if sizes:
+                    image.size = min(sizes, key=lambda frame: _frame_order(frame[0], size))
+                image.thumbnail((MAX_SIDE, MAX_SIDE))
+                image = image.convert('RGBA')
+                return image.width, image.height, image.tobytes()
+        if data.startswith(PNG_SIGNATURE):
+            return decode_png(data)
+        if data[:4] == b'\x00\x00\x01\x00':
+            return decode_ico(data, size)
+        if data[:2] == b'BM':
+            # A BMP file is a DIB behind a 14-byte file header; its height is the real one
+            return decode_bmp(data[14:], abs(struct.unpack('<i', data[22:26])[0]))
+    except Exception:
+        return None
+    return None
+
+def analyze_pixels(width, height, pixels):
+    """{"white": bool, "color": "#rrggbb" or None} from RGBA bytes"""
+    visible = white = 0
+    buckets = Counter()
+    sums = {}
+    for i in range(0, width * height * 4, 4):
+        r, g, b, a = pixels[i:i + 4]
+        if a == 0:
+            continue
+        visible += 1
+        if r > WHITE_LEVEL and g > WHITE_LEVEL and b > WHITE_LEVEL:
+            white += 1
+        if a >= 128:
+            # Dominant colour: the fullest 4-bit-per-channel bucket, averaged
+            bucket = (r >> 4, g >> 4, b >> 4)
+            buckets[bucket] += 1
+            total = sums.get(bucket)
+            if total is None:
+                sums[bucket] = [r, g, b]
+            else:
+                total[0] += r
+                total[1] += g
+                total[2] += b
+    color = None
+    if buckets:
+        bucket, count = buckets.most_common(1)[0]
+        r, g, b = (channel // count for channel in sums[bucket])
+        color = f"#{r:02x}{g:02x}{b:02x}"
+    return {"white": visible > 0 and white / visible > WHITE_SHARE, "color": color}
+
+def resize_rgba(width, height, pixels, size):
+    """RGBA bytes scaled to size x size by averaging the source pixels under each target pixel.
+
+    Colours are weighted by alpha, so transparent pixels don't darken edges.
+    Smaller sources are scaled up by repeating pixels.
+    """
+    out = bytearray()
+    for y in range(size):
+        y0 = y * height // size
+        y1 = max(y0 + 1, (y + 1) * height // size)
+        for x in range(size):
+            x0 = x * width // size
+            x1 = max(x0 + 1, (x + 1) * width // size)
+            r = g = b = a = 0
+            for sy in range(y0, y1):
+                row = sy * width * 4
+                for i in range(row + x0 * 4, row + x1 * 4, 4):
+                    alpha = pixels[i + 3]
+                    r += pixels[i] * alpha
+                    g += pixels[i + 1] * alpha
+                    b += pixels[i + 2] * alpha
+                    a += alpha
+            if a:
+                out += bytes((r // a, g // a, b // a, a // ((y1 - y0) * (x1 - x0))))
+            else:
+                out += b'\x00\x00\x00\x00'
+    return bytes(out)
+
+def _pad_square(width, height, pixels):
+    """Center a non-square image on a transparent square so scaling keeps its aspect ratio"""
+    if width == height:
+        return width, height, pixels
+    side = max(width, height)
+    left, top = (side - width) // 2, (side - height) // 2
+    out = bytearray(side * side * 4)
+    for y in range(height):
+        start = ((top + y) * side + left) * 4
+        out[start:start + width * 4] = pixels[y * width * 4:(y + 1) * width * 4]
+    return side, side, bytes(out)
+
+def _filter_cost(line):
+    """Sum of the bytes as signed values, the usual guess at which filter compresses best"""
+    return sum(value if value < 128 else 256 - value for value in line)
+
+def encode_png(width, height, pixels):
+    """Smallest-effort 8-bit RGBA PNG: Sub or Up filter per row, whichever leaves smaller values"""
+    stride = width * 4
+    raw = bytearray()
+    previous = bytes(stride)
+    for y in range(height):
+        row = pixels[y * stride:(y + 1) * stride]
+        sub = bytes((row[i] - (row[i - 4] if i >= 4 else 0)) & 0xff for i in range(stride))
+        up = bytes((row[i] - previous[i]) & 0xff for i in range(stride))
+        raw += b'\x01' + sub if _filter_cost(sub) <= _filter_cost(up) else b'\x02' + up
+        previous = row
+
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    return (PNG_SIGNATURE + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(bytes(raw), 9)) + chunk(b'IEND', b''))
+
+def process_icon(data, content_type=None, sizes=VARIANT_SIZES):
+    """Decode an icon once per needed frame: its analysis plus {size: PNG bytes} variants.
+
+    Variants are only made for icons that can be decoded and only kept when
+    they are smaller than the original.
+    """
+    if data[:4] == b'\x00\x00\x01\x00':
+        # Each size gets the ICO frame drawn for it
+        decoded = {size: decode_icon(data, content_type, size) for size in sizes}
+    else:
+        frame = decode_icon(data, content_type)
+        decoded = {size: frame for size in sizes}
+    first = decoded[sizes[0]]
+    analysis = analyze_pixels(*first) if first is not None else {"white": False, "color": None}
+    variants = {}
+    for size, frame in decoded.items():
+        if frame is None:
+            continue
+        width, height, pixels = _pad_square(*frame)
+        if (width, height) != (size, size):
+            pixels = resize_rgba(width, height, pixels, size)
+        variant = encode_png(size, size, pixels)
+        if len(variant) < len(data):
+            variants[size] = variant
+    return analysis, variants
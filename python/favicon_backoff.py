@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import random
+from collections import OrderedDict
+import threading
+import time
+from urllib.parse import urlsplit
+
+from favicon_fetcher import FetchError
+
+# Wait after an icon URL first fails, doubled for every further failure up to the maximum (seconds)
+URL_BACKOFF_BASE = 60
+URL_BACKOFF_MAX = 6 * 3600
+# Consecutive failures that take a whole host out, and how long it stays out at first, doubled
+# each time it fails again right after coming back (seconds)
+HOST_FAILURE_THRESHOLD = 5
+HOST_BACKOFF_BASE = 30
+HOST_BACKOFF_MAX = 3600
+# URLs remembered at most; beyond it the one that failed longest ago is forgotten
+MAX_FAILED_URLS = 10000
+
+class BackingOff(FetchError):
+    """An icon request refused without trying because its URL or host failed recently"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _backoff(base, maximum, attempt):
+    """Delay before the next try: exponential, with up to half of it taken off at random so retries spread out"""
+    delay = min(maximum, base * 2 ** attempt)
+    return delay * (1 - random.random() / 2)
+
+class FailureBackoff:
+    """Remembers failing icon URLs and hosts so they aren't fetched again on every render.
+
+    A URL that fails is refused for URL_BACKOFF_BASE seconds, twice as long
+    after each further failure. A host with HOST_FAILURE_THRESHOLD failures
+    in a row that say it is unreachable (network errors and 5xx answers; a
+    404 only says the icon is missing) is refused as a whole - a circuit
+    breaker - until its own backoff ends; the first request after that is
+    let through as a probe, and a failure takes the host out again for
+    twice as long. Any success clears the URL and closes the host's circuit.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        # url -> (failures, retry at), the one that failed longest ago first
+        self._urls = OrderedDict()
+        # host -> [failures in a row, retry at or None, times taken out in a row]
+        self._hosts = {}
+        self.refused = 0
+
+    def check(self, url):
+        """Raise BackingOff if url or its host is backing off"""
+        now = self.clock()
+        with self._lock:
+            failed = self._urls.get(url)
+            retry_at = failed[1] if failed is not None else None
+            host = self._hosts.get(urlsplit(url).hostname)
+            if host is not None and host[1] is not None:
+                if host[1] > now:
+                    retry_at = max(retry_at or 0, host[1])
+                else:
+                    # Half open: this request is the probe, the others wait for its outcome
+                    host[1] = now + HOST_BACKOFF_BASE
+            if retry_at is None or retry_at <= now:
+                return
+            self.refused += 1
+        raise BackingOff(f"Backing off {url}", retry_at - now)
+
+    def backing_off(self, url):
+        """Whether url itself failed lately; unlike check() this never counts a refusal or lets a probe through"""
+        now = self.clock()
+        with self._lock:
+            failed = self._urls.get(url)
+        return failed is not None and failed[1] > now
+
+    def succeeded(self, url):
+        with self._lock:
+            self._urls.pop(url, None)
+            self._hosts.pop(urlsplit(url).hostname, None)
+
+    def failed(self, url, error):
+        now = self.clock()
+        status = getattr(error, 'status', None)
+        with self._lock:
+            previous = self._urls.pop(url, None)
+            failures = previous[0] + 1 if previous is not None else 1
+            self._urls[url] = (failures, now + _backoff(URL_BACKOFF_BASE, URL_BACKOFF_MAX, failures - 1))
+            if len(self._urls) > MAX_FAILED_URLS:
+                self._urls.popitem(last=False)
+            hostname = urlsplit(url).hostname
+            if status is not None and status < 500:
+                # The host answered, so it is up
+                self._hosts.pop(hostname, None)
+                return
+            if hostname is None:
+                return
+            host = self._hosts.setdefault(hostname, [0, None, 0])
+            host[0] += 1
+            if host[0] >= HOST_FAILURE_THRESHOLD:
+                host[1] = now + _backoff(HOST_BACKOFF_BASE, HOST_BACKOFF_MAX, host[2])
+                host[2] += 1
+                print(f"[PERF] Favicon host {hostname} unreachable, backing off for {host[1] - now:.0f}s")
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                "urls": sum(1 for _, retry_at in self._urls.values() if retry_at > now),
+                "hosts": sorted(host for host, state in self._hosts.items() if state[1] is not None and state[1] > now),
+                "refused": self.refused,
+            }
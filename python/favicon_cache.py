@@ -0,0 +1,112 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Default byte budget; FINDYOURTAB_FAVICON_CACHE_MB overrides it
+DEFAULT_BUDGET = 8 * 1024 * 1024
+
+# Rough per-entry bookkeeping (key, tuple, OrderedDict node) counted against the budget
+ENTRY_OVERHEAD = 200
+
+class FaviconCache:
+    """LRU cache of favicon bytes bounded by a byte budget.
+
+    Icons are kept as the raw bytes the site sent, with their content type,
+    so a hit is written to the client as-is. Each entry is charged its URL,
+    content type and body plus a fixed overhead; when the total goes over
+    the budget the least recently used icons are evicted, so memory stays
+    flat however long the server runs. Icons larger than a quarter of the
+    budget are not cached at all - one huge icon shouldn't flush the rest.
+    Safe to use from several handler threads.
+    """
+
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = int(float(os.environ.get('FINDYOURTAB_FAVICON_CACHE_MB', 0)) * 1024 * 1024) or DEFAULT_BUDGET
+        self.budget = budget
+        # url -> (content type, bytes), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(url, content_type, data):
+        return len(url) + len(content_type) + len(data) + ENTRY_OVERHEAD
+
+    def get(self, url):
+        """(content type, bytes) of a cached icon, or None"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry
+
+    def put(self, url, content_type, data):
+        cost = self._cost(url, content_type, data)
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.size -= self._cost(url, *old)
+            if cost > self.budget // 4:
+                self.rejected += 1
+                return
+            self._entries[url] = (content_type, bytes(data))
+            self.size += cost
+            while self.size > self.budget:
+                old_url, old = self._entries.popitem(last=False)
+                self.size -= self._cost(old_url, *old)
+                self.evictions += 1
+
+    def discard(self, url):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.size -= self._cost(url, *old)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+            }
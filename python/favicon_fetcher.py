@@ -0,0 +1,332 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import http.client
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import urljoin, urlsplit
+
+FETCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Idle keep-alive connections kept per host and over all hosts, and how long one may stay idle (seconds)
+MAX_IDLE_PER_HOST = 4
+MAX_IDLE_TOTAL = 16
+IDLE_TIMEOUT = 30
+MAX_REDIRECTS = 5
+# Requests to one host at once; more wait for one of them to finish
+MAX_PER_HOST = 4
+
+# Threads downloading for a FetchPool, and at most this many of them on one host
+FETCH_WORKERS = 16
+FETCH_PER_HOST = 4
+
+class FetchError(Exception):
+    """An icon request that got no usable answer; status is the HTTP status, or None for network errors"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class FetchPending(FetchError):
+    """A download that is still running after the caller stopped waiting; it finishes in the background"""
+
+class FetchPool:
+    """Runs downloads on threads of their own, at most per_host at once for any host.
+
+    Callers hand a download over and wait on the returned Future, with a
+    deadline if they have other work to do, instead of doing network I/O on
+    their own thread. Hosts take turns for free threads, so icons from fast
+    hosts don't queue behind a slow host's backlog. A call for a key already
+    queued or running returns that call's Future, so concurrent misses for
+    one URL share a single download.
+    """
+
+    def __init__(self, workers=FETCH_WORKERS, per_host=FETCH_PER_HOST):
+        self.workers = workers
+        self.per_host = per_host
+        self._cond = threading.Condition()
+        # host -> [(key, future, function)] waiting, oldest first; hosts in turn order
+        self._waiting = {}
+        # host -> downloads running
+        self._running = {}
+        # key -> Future of the queued or running call
+        self._calls = {}
+        self._threads = []
+        self.coalesced = 0
+
+    def submit(self, key, function):
+        """Future of function(), run once for key at a time"""
+        # Host and port, as the connections are kept
+        host = urlsplit(key).netloc
+        with self._cond:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._calls[key] = Future()
+            self._waiting.setdefault(host, deque()).append((key, future, function))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'FaviconFetch-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._cond.notify()
+        return future
+
+    def _next(self):
+        """(host, call) of the first host in turn with a free slot, or None; caller holds the lock"""
+        for host, waiting in self._waiting.items():
+            if self._running.get(host, 0) < self.per_host:
+                call = waiting.popleft()
+                # The host goes to the back of the turn order, or out if nothing else waits on it
+                del self._waiting[host]
+                if waiting:
+                    self._waiting[host] = waiting
+                return host, call
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next()
+                host, (key, future, function) = job
+                self._running[host] = self._running.get(host, 0) + 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(function())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    del self._calls[key]
+                    self._running[host] -= 1
+                    if not self._running[host]:
+                        del self._running[host]
+                    # A host slot is free again
+                    self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": sum(len(waiting) for waiting in self._waiting.values()),
+                "running": sum(self._running.values()),
+                "coalesced": self.coalesced,
+            }
+
+class FaviconFetcher:
+    """Downloads icons over keep-alive connections reused per host.
+
+    Opening a connection (and a TLS handshake) usually costs more than the
+    icon itself, and a popup asks for many icons from the same few hosts, so
+    finished connections go back to a small per-host idle pool instead of
+    being closed. Connections idle for more than idle_timeout are closed,
+    and so are the oldest ones once more than max_idle_total are idle, so a
+    long session that has met many hosts doesn't pile up sockets the hosts
+    have long since given up on. A pooled connection the host has meanwhile closed is
+    retried once on a fresh one. Redirects are followed like urllib does.
+    Safe to use from several threads; each request has its own connection
+    while it runs, and at most max_per_host requests go to one host at once,
+    the rest waiting for a connection of theirs to come back.
+    """
+
+    def __init__(self, timeout=5, max_idle_per_host=MAX_IDLE_PER_HOST, max_idle_total=MAX_IDLE_TOTAL,
+                 idle_timeout=IDLE_TIMEOUT, max_per_host=MAX_PER_HOST):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.max_idle_total = max_idle_total
+        self.idle_timeout = idle_timeout
+        self.max_per_host = max_per_host
+        # (scheme, host, port) -> [(connection, idle since)], most recently used last
+        self._idle = {}
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        # (scheme, host, port) -> requests running; _slot_free is signalled when one ends
+        self._active = {}
+        self._slot_free = threading.Condition(self._lock)
+        self.opened = 0
+        self.reused = 0
+        self.expired = 0
+        self.requests = 0
+
+    def _prune(self):
+        """Take out connections idle too long and the oldest beyond max_idle_total; caller holds the lock and closes them"""
+        now = time.monotonic()
+        stale = []
+        for origin, idle in list(self._idle.items()):
+            while idle and now - idle[0][1] > self.idle_timeout:
+                stale.append(idle.pop(0)[0])
+            if not idle:
+                del self._idle[origin]
+        while len(stale) < self._idle_count - self.max_idle_total:
+            origin = min(self._idle, key=lambda origin: self._idle[origin][0][1])
+            stale.append(self._idle[origin].pop(0)[0])
+            if not self._idle[origin]:
+                del self._idle[origin]
+        self._idle_count -= len(stale)
+        self.expired += len(stale)
+        return stale
+
+    def _acquire(self, origin):
+        with self._lock:
+            while self._active.get(origin, 0) >= self.max_per_host:
+                self._slot_free.wait()
+            self._active[origin] = self._active.get(origin, 0) + 1
+            stale = self._prune()
+            idle = self._idle.get(origin)
+            if idle:
+                self.reused += 1
+                self._idle_count -= 1
+                connection = idle.pop()[0]
+                if not idle:
+                    del self._idle[origin]
+            else:
+                connection = None
+                self.opened += 1
+        for old in stale:
+            old.close()
+        if connection is not None:
+            return connection, True
+        scheme, host, port = origin
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, origin, connection):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((connection, time.monotonic()))
+                self._idle_count += 1
+                connection = None
+            stale = self._prune()
+        if connection is not None:
+            connection.close()
+        for old in stale:
+            old.close()
+
+    def _leave(self, origin):
+        with self._lock:
+            self._active[origin] -= 1
+            if not self._active[origin]:
+                del self._active[origin]
+            self._slot_free.notify()
+
+    def _request(self, url, headers):
+        """One GET without following redirects; returns (response, body)"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise FetchError(f"Unsupported favicon URL: {url}")
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        while True:
+            connection, reused = self._acquire(origin)
+            try:
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    connection.close()
+                    if reused:
+                        # The host dropped the idle connection; that says nothing about the icon
+                        continue
+                    raise
+                except Exception:
+                    connection.close()
+                    raise
+                if response.will_close:
+                    connection.close()
+                else:
+                    self._release(origin, connection)
+                return response, body
+            finally:
+                # After _release, so a request waiting for this host finds the connection idle
+                self._leave(origin)
+
+    def fetch(self, url, etag=None, last_modified=None):
+        """GET an icon, conditionally if validators are given.
+
+        Returns (status, content type, bytes, etag, last modified); status is
+        304 with no bytes when the cached copy is still current. data: URLs
+        are decoded in place, as urllib did for the proxy before this class.
+        """
+        if url.startswith('data:'):
+            # The icon is in the URL itself; urllib decodes it without any connection
+            try:
+                with urllib.request.urlopen(url) as response:
+                    return 200, response.headers.get_content_type(), response.read(), None, None
+            except (OSError, ValueError) as e:
+                raise FetchError(f"Bad data: favicon URL: {e}") from e
+        headers = dict(FETCH_HEADERS)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        self.requests += 1
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                response, body = self._request(url, headers)
+                if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                    url = urljoin(url, response.getheader('Location'))
+                    continue
+                if response.status == 304:
+                    return 304, None, None, etag, last_modified
+                if response.status >= 400:
+                    raise FetchError(f"HTTP {response.status} for {url}", response.status)
+                return (response.status, response.getheader('Content-type', 'image/x-icon'), body,
+                        response.getheader('ETag'), response.getheader('Last-Modified'))
+        except (OSError, http.client.HTTPException) as e:
+            raise FetchError(f"{type(e).__name__}: {e} for {url}") from e
+        raise FetchError(f"Too many redirects for {url}")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            self._idle_count = 0
+        for connections in idle.values():
+            for connection, _ in connections:
+                connection.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.opened,
+                "connections_reused": self.reused,
+                "connections_expired": self.expired,
+                "idle": self._idle_count,
+                "idle_hosts": len(self._idle),
+                "active": sum(self._active.values()),
+            }
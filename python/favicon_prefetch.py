@@ -0,0 +1,201 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Icons downloaded at once, and at most this many from any one host
+PREFETCH_WORKERS = 4
+PREFETCH_PER_HOST = 2
+
+def _host(url):
+    return urlsplit(url).hostname
+
+class FaviconPrefetcher:
+    """Downloads the icons of new tabs in the background, before a popup asks for them.
+
+    Listens to the TabStore: a tab whose icon is neither in the FaviconStore
+    nor failing lately (see FailureBackoff) queues the icon. Icons of more frecent tabs come first,
+    and a visit moves a waiting icon up; an icon still waiting when the last
+    tab using it closes is dropped. A few worker threads work through the
+    queue with at most per_host downloads per host, so one slow site can't
+    occupy every worker. Downloads go through FaviconStore.fetch_and_store,
+    so a popup asking for an icon that is being prefetched waits for that
+    download instead of starting another one.
+    """
+
+    def __init__(self, favicon_store, store=None, frecency=None, workers=PREFETCH_WORKERS, per_host=PREFETCH_PER_HOST):
+        self.favicon_store = favicon_store
+        self.store = store
+        self.frecency = frecency
+        self.workers = workers
+        self.per_host = per_host
+        self._cond = threading.Condition()
+        # (priority, order, url), best first; entries of dropped or re-prioritized icons are skipped when popped
+        self._heap = []
+        self._order = 0
+        # url -> priority of its current heap entry
+        self._queued = {}
+        # host -> downloads running
+        self._running = {}
+        # URLs queued or downloading; once done an icon is in the FaviconStore or backing off
+        self._seen = set()
+        self._threads = []
+        self._stopped = False
+        # Start of the current burst, for the summary printed when the queue drains
+        self._burst_start = None
+        self._burst_fetched = 0
+        self.fetched = 0
+        self.failed = 0
+        self.cancelled = 0
+        if store is not None:
+            for record in store.all_tabs():
+                self.tab_added(record)
+            store.add_listener(self)
+        if frecency is not None:
+            frecency.add_listener(self)
+
+    def _priority(self, record):
+        score = self.frecency.score(record.key) if self.frecency is not None else None
+        return -score if score is not None else math.inf
+
+    def _queue(self, url, priority):
+        """Put an icon on the queue, or move it up; caller holds the lock"""
+        if url in self._queued:
+            if priority >= self._queued[url]:
+                return
+        elif (url in self._seen or self.favicon_store.lookup(url) is not None
+              or self.favicon_store.backoff.backing_off(url)):
+            return
+        self._seen.add(url)
+        self._queued[url] = priority
+        self._order += 1
+        heapq.heappush(self._heap, (priority, self._order, url))
+        if self._burst_start is None:
+            self._burst_start = time.perf_counter()
+            self._burst_fetched = 0
+        if not self._threads:
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'FaviconPrefetch-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._cond.notify()
+
+    def tab_added(self, record):
+        url = record.fav_icon_url
+        if not url or urlsplit(url).scheme not in ('http', 'https'):
+            return
+        with self._cond:
+            self._queue(url, self._priority(record))
+
+    def tab_removed(self, record):
+        url = record.fav_icon_url
+        if url not in self._queued or self.store.icon_tab_count(url):
+            return
+        with self._cond:
+            if self._queued.pop(url, None) is not None:
+                # Tried again if a tab with this icon opens later
+                self._seen.discard(url)
+                self.cancelled += 1
+
+    def frecency_changed(self, record):
+        url = record.fav_icon_url
+        if url in self._queued:
+            with self._cond:
+                self._queue(url, self._priority(record))
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._queued),
+                "running": sum(self._running.values()),
+                "fetched": self.fetched,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+            }
+
+    def _next(self):
+        """Best queued icon whose host has a free slot, or None; caller holds the lock"""
+        busy = []
+        url = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if self._queued.get(entry[2]) != entry[0]:
+                continue
+            if self._running.get(_host(entry[2]), 0) >= self.per_host:
+                busy.append(entry)
+                continue
+            url = entry[2]
+            del self._queued[url]
+            break
+        for entry in busy:
+            heapq.heappush(self._heap, entry)
+        return url
+
+    def _run(self):
+        while True:
+            with self._cond:
+                url = self._next()
+                while url is None and not self._stopped:
+                    self._cond.wait()
+                    url = self._next()
+                if self._stopped:
+                    return
+                host = _host(url)
+                self._running[host] = self._running.get(host, 0) + 1
+            outcome = 'skipped'
+            try:
+                # The popup may have asked for it in the meantime
+                if self.favicon_store.lookup(url) is None:
+                    self.favicon_store.fetch_and_store(url, wait=None)
+                    outcome = 'fetched'
+            except Exception:
+                # Left to the popup, which shows its fallback icon
+                outcome = 'failed'
+            with self._cond:
+                self._seen.discard(url)
+                self._running[host] -= 1
+                if not self._running[host]:
+                    del self._running[host]
+                if outcome == 'fetched':
+                    self.fetched += 1
+                    self._burst_fetched += 1
+                elif outcome == 'failed':
+                    self.failed += 1
+                if not self._queued and not self._running and self._burst_start is not None:
+                    print(f"[PERF] Prefetched {self._burst_fetched} favicons in "
+                          f"{(time.perf_counter() - self._burst_start) * 1000:.0f} ms")
+                    self._burst_start = None
+                # A host slot is free again
+                self._cond.notify_all()
@@ -0,0 +1,541 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from favicon_analysis import VARIANT_SIZES, process_icon
+from favicon_backoff import BackingOff, FailureBackoff
+from favicon_fetcher import FaviconFetcher, FetchPending, FetchPool
+
+# Entries older than this are revalidated (in the background) when next served
+REVALIDATE_AFTER = 24 * 3600
+
+# Rewrite the journal once it has this many more lines than live entries
+COMPACT_SLACK = 500
+
+# Icons kept, and bytes of blobs (originals and variants) kept; beyond either the least
+# recently used icons are dropped down to PRUNE_TO of the limit. FINDYOURTAB_FAVICON_DISK_MB overrides the bytes.
+MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+PRUNE_TO = 0.9
+
+# Seconds a request waits for an icon download before it gets FetchPending; the download carries on
+FETCH_WAIT = 0.5
+
+# Processes decoding icons for process_icon(), each waited on by a thread of the store
+ANALYSIS_WORKERS = 2
+
+def _processed_fields(record):
+    return {"analysis": record.get('analysis'), "variants": record['variants'], "bytes": record.get('bytes', {})}
+
+def default_directory():
+    """Per-user cache directory; FINDYOURTAB_FAVICON_DIR overrides it"""
+    directory = os.environ.get('FINDYOURTAB_FAVICON_DIR')
+    if directory:
+        return directory
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'FindYourTab', 'favicons')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'findyourtab', 'favicons')
+
+class FaviconStore:
+    """Favicons on disk, keyed by URL, with the bytes stored once per content hash.
+
+    The directory holds blobs/<first two hex digits>/<sha256> files and an
+    append-only index.jsonl journal with one line per URL change (hash,
+    content type, ETag, Last-Modified and when it was last checked). The
+    journal is replayed into memory on start, so after a restart every known
+    icon is served from disk without touching the network. Entries older
+    than revalidate_after are still served immediately; a background thread
+    then revalidates them with If-None-Match / If-Modified-Since and only
+    downloads the icon again if the site says it changed. Sites that share
+    an icon share one blob. When the journal grows well past the number of
+    entries it is rewritten and blobs nothing points to any more are deleted.
+
+    The store is bounded by max_entries icons and max_bytes of blobs. Entries
+    are kept in least recently used order (reads move an entry to the end,
+    and the journal is rewritten in that order, so it survives a restart
+    roughly); going over either limit drops the least recently used entries
+    and compacts, which deletes their blobs.
+
+    Each new icon is decoded once in a small pool of worker processes (see
+    favicon_analysis) to find whether it is mostly white and its dominant
+    colour, and to make small 16px and 32px PNG variants from the frame that
+    suits each size. Variants are blobs like the originals. The result is
+    journaled with the entry, shared by every URL with the same bytes, and
+    the analysis is handed to listeners so the server can ship it with the tabs.
+
+    If the directory can't be written the store keeps working in memory only.
+    """
+
+    def __init__(self, directory=None, revalidate_after=REVALIDATE_AFTER, fetch=None, on_change=None,
+                 max_entries=MAX_ENTRIES, max_bytes=None):
+        self.directory = directory or default_directory()
+        self.revalidate_after = revalidate_after
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('FINDYOURTAB_FAVICON_DISK_MB', 0)) * 1024 * 1024) or DEFAULT_MAX_BYTES
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (url, etag, last modified) -> (status, content type, bytes, etag, last modified); see FaviconFetcher.fetch
+        self.fetcher = FaviconFetcher() if fetch is None else None
+        self.fetch = fetch or self.fetcher.fetch
+        # Downloads run here rather than on the caller's thread; concurrent misses for one URL share one
+        self._downloads = FetchPool()
+        # URLs and hosts that failed lately are refused without a request
+        self.backoff = FailureBackoff()
+        # Notified with icon_analyzed(url, analysis), from an analysis thread
+        self._listeners = []
+        self._analysis_pool = None
+        self._decode_pool = None
+        # Hashes being processed -> URLs waiting for the result, and
+        # hash -> {"analysis", "variants": {size: hash}, "bytes": {"original" or size: length}}
+        self._processing = {}
+        self._processed = {}
+        self.analyzed = 0
+        # Called with (url, content type, bytes) when revalidation brings a new icon
+        self.on_change = on_change
+        # url -> {"hash", "type", "etag", "modified", "checked"} plus the fields of _processed once known,
+        # least recently used first
+        self._entries = {}
+        # hash -> size of every blob on disk, and their total
+        self._blob_sizes = {}
+        self._blob_bytes = 0
+        self.pruned = 0
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._persistent = True
+        self._journal = None
+        # URLs waiting for revalidation and the thread working through them
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.disk_hits = 0
+        self.revalidated = 0
+        self.refreshed = 0
+        self.revalidation_errors = 0
+        self._load()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, 'blobs', digest[:2], digest)
+
+    def _journal_path(self):
+        return os.path.join(self.directory, 'index.jsonl')
+
+    def _disable(self, error):
+        if self._persistent:
+            print(f"Favicon disk cache disabled: {error}")
+        self._persistent = False
+
+    def _load(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._journal_path(), 'r', encoding='utf-8') as journal:
+                for line in journal:
+                    self._lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; everything before it is fine
+                        continue
+                    url = record.pop('url', None)
+                    # Later lines are more recent uses
+                    self._entries.pop(url, None)
+                    if record.get('hash'):
+                        self._entries[url] = record
+                        if 'variants' in record:
+                            self._processed[record['hash']] = _processed_fields(record)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self._disable(e)
+        try:
+            blobs = os.path.join(self.directory, 'blobs')
+            for prefix in os.listdir(blobs) if os.path.isdir(blobs) else ():
+                for digest in os.listdir(os.path.join(blobs, prefix)):
+                    self._blob_sizes[digest] = os.path.getsize(os.path.join(blobs, prefix, digest))
+            self._blob_bytes = sum(self._blob_sizes.values())
+        except OSError as e:
+            self._disable(e)
+        # Blobs of entries dropped while their icon was still being processed, left over from the last run
+        live = {record['hash'] for record in self._entries.values()}
+        live.update(variant for processed in self._processed.values() for variant in processed['variants'].values())
+        if not live.issuperset(self._blob_sizes):
+            self._compact()
+        print(f"[PERF] Favicon disk cache: {len(self._entries)} icons in {self.directory}")
+
+    def _append(self, url, record):
+        """Journal one entry change; caller holds the lock"""
+        if self._persistent:
+            try:
+                if self._journal is None:
+                    self._journal = open(self._journal_path(), 'a', encoding='utf-8')
+                self._journal.write(json.dumps(dict(record, url=url)) + '\n')
+                self._journal.flush()
+                self._lines += 1
+            except OSError as e:
+                self._disable(e)
+        if len(self._entries) > self.max_entries or self._blob_bytes > self.max_bytes:
+            self._prune()
+            self._compact()
+        elif self._lines > len(self._entries) + COMPACT_SLACK:
+            self._compact()
+
+    def _prune(self):
+        """Drop least recently used entries until both limits have room again; caller holds the lock"""
+        # Bytes an entry frees are those of its blobs, once no remaining entry shares them
+        users = {}
+        for record in self._entries.values():
+            users[record['hash']] = users.get(record['hash'], 0) + 1
+        size = sum(self._blob_sizes.get(digest, 0) for digest in users)
+        size += sum(self._blob_sizes.get(variant, 0) for digest in users
+                    for variant in self._processed.get(digest, {}).get('variants', {}).values())
+        for url in list(self._entries):
+            if len(self._entries) <= self.max_entries * PRUNE_TO and size <= self.max_bytes * PRUNE_TO:
+                break
+            record = self._entries.pop(url)
+            self.pruned += 1
+            users[record['hash']] -= 1
+            if not users[record['hash']]:
+                size -= self._blob_sizes.get(record['hash'], 0)
+                for digest in record.get('variants', {}).values():
+                    size -= self._blob_sizes.get(digest, 0)
+        print(f"[PERF] Favicon disk cache pruned to {len(self._entries)} icons")
+
+    def _touch(self, url):
+        """Mark an entry as just used"""
+        with self._lock:
+            record = self._entries.pop(url, None)
+            if record is not None:
+                self._entries[url] = record
+
+    def _compact(self):
+        """Rewrite the journal with one line per entry and drop unreferenced blobs; caller holds the lock"""
+        live = {record['hash'] for record in self._entries.values()}
+        self._processed = {digest: processed for digest, processed in self._processed.items() if digest in live}
+        if not self._persistent:
+            return
+        path = self._journal_path()
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            with open(path + '.tmp', 'w', encoding='utf-8') as journal:
+                for url, record in self._entries.items():
+                    journal.write(json.dumps(dict(record, url=url)) + '\n')
+            os.replace(path + '.tmp', path)
+            self._lines = len(self._entries)
+            for processed in self._processed.values():
+                live.update(processed['variants'].values())
+            blobs = os.path.join(self.directory, 'blobs')
+            for prefix in os.listdir(blobs) if os.path.isdir(blobs) else ():
+                for digest in os.listdir(os.path.join(blobs, prefix)):
+                    if digest not in live:
+                        os.remove(os.path.join(blobs, prefix, digest))
+                        self._blob_bytes -= self._blob_sizes.pop(digest, 0)
+        except OSError as e:
+            self._disable(e)
+
+    def _write_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if self._persistent and not os.path.exists(path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + '.tmp', 'wb') as blob:
+                    blob.write(data)
+                os.replace(path + '.tmp', path)
+                self._blob_sizes[digest] = len(data)
+                self._blob_bytes += len(data)
+            except OSError as e:
+                self._disable(e)
+        return digest
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def analysis(self, url):
+        """{"white", "color"} of a cached icon, or None if it isn't known (yet)"""
+        record = self._entries.get(url)
+        return record.get('analysis') if record is not None else None
+
+    def _queue_processing(self, url, record, data):
+        """Process an entry's bytes on the pool unless that is already under way; caller holds the lock"""
+        waiting = self._processing.get(record['hash'])
+        if waiting is not None:
+            waiting.add(url)
+            return
+        self._processing[record['hash']] = {url}
+        if self._analysis_pool is None:
+            self._analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='FaviconAnalysis')
+        self._analysis_pool.submit(self._process, record['hash'], record['type'], data)
+
+    def _decode(self, data, content_type):
+        """process_icon() in a worker process: the pure-Python decoders would hold the GIL for
+        a few hundred ms per large icon and stall the event loop if they ran on a thread here"""
+        with self._lock:
+            if self._decode_pool is None:
+                self._decode_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+            pool = self._decode_pool
+        try:
+            return pool.submit(process_icon, data, content_type).result()
+        except BrokenProcessPool:
+            # A worker died; start over with a fresh pool for the next icon
+            with self._lock:
+                if self._decode_pool is pool:
+                    self._decode_pool = None
+            raise
+
+    def _process(self, digest, content_type, data):
+        try:
+            analysis, variants = self._decode(data, content_type)
+        except Exception as e:
+            print(f"Error analyzing favicon: {e}")
+            analysis, variants = {"white": False, "color": None}, {}
+        processed_urls = []
+        with self._lock:
+            self.analyzed += 1
+            # Entries pruned or replaced while the icon was decoded need no variants
+            waiting = [url for url in self._processing.pop(digest, ())
+                       if self._entries.get(url, {}).get('hash') == digest]
+            if not waiting:
+                return
+            sizes = {"original": len(data)}
+            sizes.update((str(size), len(variant)) for size, variant in variants.items())
+            processed = self._processed[digest] = {
+                "analysis": analysis,
+                "variants": {str(size): self._write_blob(variant) for size, variant in variants.items()},
+                "bytes": sizes,
+            }
+            for url in waiting:
+                record = self._entries.get(url)
+                if record is not None and record['hash'] == digest:
+                    record = self._entries[url] = dict(record, **processed)
+                    self._append(url, record)
+                    processed_urls.append(url)
+        for url in processed_urls:
+            for listener in self._listeners:
+                listener.icon_analyzed(url, analysis)
+
+    def variant(self, url, size):
+        """(content type, bytes) of the normalized size x size PNG of a cached icon, or None if there is none (yet)"""
+        record = self._entries.get(url)
+        digest = record.get('variants', {}).get(str(size)) if record is not None else None
+        if digest is None:
+            return None
+        try:
+            with open(self._blob_path(digest), 'rb') as blob:
+                return 'image/png', blob.read()
+        except OSError:
+            return None
+
+    def lookup(self, url):
+        """Cached metadata for a URL, or None"""
+        return self._entries.get(url)
+
+    def read(self, url):
+        """(content type, bytes) from disk, or None; queues a revalidation if the entry is old"""
+        record = self._entries.get(url)
+        if record is None:
+            return None
+        try:
+            with open(self._blob_path(record['hash']), 'rb') as blob:
+                data = blob.read()
+        except OSError:
+            return None
+        self.disk_hits += 1
+        if 'variants' not in record:
+            # Cached before icons were processed
+            with self._lock:
+                self._queue_processing(url, record, data)
+        self.revalidate_if_stale(url)
+        return record['type'], data
+
+    def put(self, url, content_type, data, etag=None, last_modified=None):
+        """Store a freshly downloaded icon"""
+        with self._lock:
+            digest = self._write_blob(data)
+            record = {
+                "hash": digest,
+                "type": content_type,
+                "etag": etag,
+                "modified": last_modified,
+                "checked": time.time(),
+            }
+            # Bytes already processed under another URL needn't be decoded again
+            processed = self._processed.get(digest)
+            if processed is not None:
+                record.update(processed)
+            self._entries.pop(url, None)
+            self._entries[url] = record
+            self._append(url, record)
+            if processed is None:
+                self._queue_processing(url, record, data)
+                return
+        for listener in self._listeners:
+            listener.icon_analyzed(url, record['analysis'])
+
+    def fetch_and_store(self, url, wait=FETCH_WAIT):
+        """Download an icon that isn't cached; returns (content type, bytes).
+
+        Raises BackingOff if it failed lately, and FetchPending if the download
+        takes longer than wait seconds (None waits for it); it then finishes in
+        the background and the icon is read from the store next time.
+        """
+        self.backoff.check(url)
+        future = self._downloads.submit(url, lambda: self._fetch_and_store(url))
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeoutError:
+            raise FetchPending(f"Still downloading {url}") from None
+
+    def _fetch(self, url, etag=None, last_modified=None):
+        try:
+            result = self.fetch(url, etag, last_modified)
+        except Exception as e:
+            self.backoff.failed(url, e)
+            raise
+        self.backoff.succeeded(url)
+        return result
+
+    def _fetch_and_store(self, url):
+        _, content_type, data, etag, last_modified = self._fetch(url)
+        self.put(url, content_type, data, etag, last_modified)
+        return content_type, data
+
+    def revalidate_if_stale(self, url):
+        """Count a use of a cached icon, and have it revalidated in the background if it is old"""
+        self._touch(url)
+        record = self._entries.get(url)
+        if record is None or time.time() - record['checked'] < self.revalidate_after or url.startswith('data:'):
+            return
+        with self._lock:
+            if url in self._pending:
+                return
+            self._pending.add(url)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True, name='FaviconRevalidation')
+                self._worker.start()
+        self._queue.put(url)
+
+    def _run(self):
+        while True:
+            url = self._queue.get()
+            try:
+                self._revalidate(url)
+            except BackingOff:
+                # Still served from disk; tried again once the backoff is over
+                pass
+            except Exception as e:
+                self.revalidation_errors += 1
+                print(f"Error revalidating favicon {url}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(url)
+
+    def _revalidate(self, url):
+        record = self._entries.get(url)
+        if record is None:
+            return
+        self.backoff.check(url)
+        status, content_type, data, etag, last_modified = self._fetch(url, record.get('etag'), record.get('modified'))
+        self.revalidated += 1
+        if status == 304:
+            with self._lock:
+                record = dict(record, checked=time.time(),
+                              etag=etag or record.get('etag'), modified=last_modified or record.get('modified'))
+                self._entries[url] = record
+                self._append(url, record)
+            return
+        self.put(url, content_type, data, etag, last_modified)
+        self.refreshed += 1
+        if self.on_change is not None:
+            self.on_change(url, content_type, data)
+
+    def _normalization_stats(self):
+        """Bytes per icon before and after normalization, over the distinct icons processed; caller holds the lock"""
+        icons = [processed['bytes'] for processed in self._processed.values()]
+        stats = {"icons": len(icons), "original_bytes": sum(sizes['original'] for sizes in icons)}
+        for size in VARIANT_SIZES:
+            with_variant = [sizes for sizes in icons if str(size) in sizes]
+            saved = sum(sizes['original'] - sizes[str(size)] for sizes in with_variant)
+            stats[f"{size}px"] = {
+                "icons": len(with_variant),
+                "bytes": sum(sizes[str(size)] for sizes in with_variant),
+                "saved_per_icon": round(saved / len(with_variant)) if with_variant else 0,
+            }
+        return stats
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "blobs": len(self._blob_sizes),
+                "bytes": self._blob_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "pruned": self.pruned,
+                "persistent": self._persistent,
+                "disk_hits": self.disk_hits,
+                "revalidated": self.revalidated,
+                "refreshed": self.refreshed,
+                "revalidation_errors": self.revalidation_errors,
+                "pending": len(self._pending),
+                "downloads": self._downloads.stats(),
+                "analyzed": self.analyzed,
+                "normalized": self._normalization_stats(),
+                "fetcher": self.fetcher.stats() if self.fetcher is not None else None,
+                "backoff": self.backoff.stats(),
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_favicon_store():
+    """The process-wide store, created on first use so importing never touches the disk"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FaviconStore()
+    return _store
+
+def set_favicon_store(store):
+    global _store
+    with _store_lock:
+        _store = store
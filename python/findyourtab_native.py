@@ -32,6 +32,7 @@ import asyncio
 import webview
 import keyboard
 import threading
+import multiprocessing
 from websocket_server import TabWebSocketServer
 from http_server import run_http_server
 
@@ -118,6 +119,8 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Favicon decoding runs in worker processes, which a frozen executable has to be able to start
+    multiprocessing.freeze_support()
     try:
         main()
     except KeyboardInterrupt:
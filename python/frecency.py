@@ -0,0 +1,108 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import math
+import time
+from bisect import bisect_left, insort
+
+# A visit counts half as much after this many seconds
+HALF_LIFE = 12 * 3600
+
+# Visit weights: picking a tab in FindYourTab says more than switching to it in the browser
+ACTIVATE_WEIGHT = 2.0
+FOCUS_WEIGHT = 1.0
+
+class FrecencyIndex:
+    """Exponentially decayed visit score per tab, kept in rank order.
+
+    A tab's frecency at time t is sum(weight * 2 ** -((t - visit) / HALF_LIFE))
+    over its visits. Decay multiplies every score by the same factor, so it
+    never changes the order; the index stores each score in log2 form
+    relative to a fixed epoch instead, log2(sum(weight * 2 ** (visit /
+    HALF_LIFE))), which only changes when the tab itself is visited. That
+    keeps a sorted list valid between visits: a visit moves one entry, and
+    the top k are the first k entries - no re-sorting, no overflow.
+    """
+
+    def __init__(self, half_life=HALF_LIFE, clock=time.time):
+        self.half_life = half_life
+        self.clock = clock
+        # (-log score, tie-breaker, key), best first
+        self._ranked = []
+        # key -> (its entry in _ranked, TabRecord)
+        self._entries = {}
+        # Notified with frecency_changed(record) after every visit
+        self._listeners = []
+        self.visits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def visit(self, record, weight=FOCUS_WEIGHT, now=None):
+        """Record a visit to a tab and return its new log score"""
+        now = self.clock() if now is None else now
+        key = record.key
+        added = math.log2(weight) + now / self.half_life
+        old = self._entries.get(key)
+        if old is None:
+            score = added
+        else:
+            self._ranked.pop(bisect_left(self._ranked, old[0]))
+            previous = -old[0][0]
+            # log2(2 ** previous + 2 ** added) without leaving log space
+            high, low = max(previous, added), min(previous, added)
+            score = high + math.log2(1 + 2 ** (low - high))
+        self.visits += 1
+        # Equal scores: the latest visit first
+        entry = (-score, -self.visits, key)
+        insort(self._ranked, entry)
+        self._entries[key] = (entry, record)
+        for listener in self._listeners:
+            listener.frecency_changed(record)
+        return score
+
+    def forget(self, key):
+        """Drop a closed tab"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._ranked.pop(bisect_left(self._ranked, old[0]))
+
+    def score(self, key):
+        """Log score of a tab (only comparable with other scores), or None if never visited"""
+        entry = self._entries.get(key)
+        return -entry[0][0] if entry is not None else None
+
+    def ranked(self, limit=None):
+        """Visited tabs as TabRecords, most frecent first"""
+        entries = self._ranked if limit is None else self._ranked[:limit]
+        return [self._entries[key][1] for _, _, key in entries]
+
+    def scores(self):
+        """{key: rounded log score} for every visited tab, for clients to order by"""
+        return {key: round(-entry[0], 4) for key, (entry, _) in self._entries.items()}
@@ -25,17 +25,63 @@ SOFTWARE.
 """
 
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import os
 import sys
 import urllib.parse
-import urllib.request
-import base64
+import json
+import struct
 from pathlib import Path
 
+from favicon_analysis import VARIANT_SIZES
+from favicon_cache import FaviconCache
+from favicon_backoff import BackingOff
+from favicon_fetcher import FetchPending
+from favicon_store import get_favicon_store
+
+# Requests handled at once; the rest wait for a free worker
+HTTP_WORKERS = 16
+# Most icons one /favicon-bundle request may ask for
+BUNDLE_MAX_ICONS = 500
+# Icons of bundles read or downloaded at once
+BUNDLE_WORKERS = 16
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles requests on a bounded pool of worker threads.
+
+    A favicon from a slow host then only ties up the worker fetching it while
+    the popup page, static files and cached icons keep being served.
+    """
+
+    # A popup opening asks for dozens of icons at once; with the default backlog
+    # of 5 the connections beyond it are dropped and only retried a second later
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=HTTP_WORKERS):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='HTTPWorker')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
 class ExtensionHandler(SimpleHTTPRequestHandler):
-    favicon_cache = {}
-    
+    # Shared by every request; bounded by its byte budget
+    favicon_cache = FaviconCache()
+    # Loads the icons of /favicon-bundle requests in parallel, apart from the request workers
+    bundle_pool = ThreadPoolExecutor(max_workers=BUNDLE_WORKERS, thread_name_prefix='FaviconBundle')
     def get_static_file_path(self, filename):
         """Get the correct path for static files in both development and executable environments"""
         import sys
@@ -50,51 +96,144 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
         
         return os.path.join(base_path, 'static', filename)
     
+    @classmethod
+    def favicon_changed(cls, favicon_url, content_type, icon_data):
+        cls.favicon_cache.put(favicon_url, content_type, icon_data)
+        # Variants of the old icon; the new ones are read from the store once made
+        for size in VARIANT_SIZES:
+            cls.favicon_cache.discard(f"{size}:{favicon_url}")
+    
+    def read_favicon(self, favicon_url):
+        """(content type, bytes) of the original icon: memory first, then the disk store (icons from earlier runs), then the network"""
+        store = get_favicon_store()
+        cached = self.favicon_cache.get(favicon_url)
+        if cached is not None:
+            store.revalidate_if_stale(favicon_url)
+        else:
+            cached = store.read(favicon_url)
+            if cached is None:
+                cached = store.fetch_and_store(favicon_url)
+            self.favicon_cache.put(favicon_url, *cached)
+        return cached
+    
+    def read_variant(self, favicon_url, size):
+        """(content type, bytes) of the size px PNG made from a stored icon, or None if there isn't one yet"""
+        key = f"{size}:{favicon_url}"
+        cached = self.favicon_cache.get(key)
+        if cached is None:
+            cached = get_favicon_store().variant(favicon_url, size)
+            if cached is not None:
+                self.favicon_cache.put(key, *cached)
+        else:
+            get_favicon_store().revalidate_if_stale(favicon_url)
+        return cached
+    
+    def read_icon(self, favicon_url, size=None):
+        """(content type, bytes) of the normalized variant if one of that size was made, else of the original icon"""
+        cached = self.read_variant(favicon_url, size) if size in [str(variant) for variant in VARIANT_SIZES] else None
+        if cached is None:
+            cached = self.read_favicon(favicon_url)
+        return cached
+    
+    def favicon_bundle(self, favicon_urls, size=None):
+        """Every icon asked for in one body: a 4-byte big-endian header length, a JSON header, then the icons' bytes.
+        
+        The header is {"icons": [{"url", "type", "offset", "length"}]} in request
+        order, offsets counted from the end of the header; icons that couldn't
+        be loaded have type null and length 0.
+        """
+        def load(favicon_url):
+            try:
+                return self.read_icon(favicon_url, size)
+            except (BackingOff, FetchPending):
+                return None
+            except Exception as e:
+                print(f"Error proxying favicon: {e}")
+                return None
+        
+        entries = []
+        icons = []
+        offset = 0
+        for favicon_url, icon in zip(favicon_urls, self.bundle_pool.map(load, favicon_urls)):
+            content_type, icon_data = icon if icon is not None else (None, b'')
+            entries.append({"url": favicon_url, "type": content_type, "offset": offset, "length": len(icon_data)})
+            icons.append(icon_data)
+            offset += len(icon_data)
+        header = json.dumps({"icons": entries}).encode()
+        return struct.pack('>I', len(header)) + header + b''.join(icons)
+    
+    def send_fallback_icon(self, max_age=None):
+        self.send_response(200)
+        self.send_header('Content-type', 'image/svg+xml')
+        if max_age is not None:
+            self.send_header('Cache-Control', f'max-age={max_age}')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        
+        # Get the correct path for both development and executable
+        fallback_path = self.get_static_file_path('fallback.svg')
+        with open(fallback_path, 'rb') as f:
+            self.wfile.write(f.read())
+    
+    def do_POST(self):
+        if self.path == '/favicon-bundle':
+            # {"urls": [favicon URLs], "size": 16 or 32 (optional)}
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                favicon_urls = [str(favicon_url) for favicon_url in request['urls']]
+                size = str(request.get('size'))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Bad favicon bundle request: {e}")
+                self.send_error(400)
+                return
+            if len(favicon_urls) > BUNDLE_MAX_ICONS:
+                self.send_error(413)
+                return
+            
+            body = self.favicon_bundle(favicon_urls, size)
+            self.send_response(200)
+            self.send_header('Content-type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+    
     def do_GET(self):
-        if self.path.startswith('/proxy-favicon?url='):
+        if self.path.startswith('/proxy-favicon?'):
             try:
-                # Extract the original favicon URL
-                favicon_url = self.path.split('url=')[1]
+                # Optional size of the normalized PNG wanted (16 or 32), then the original favicon URL.
+                # Everything after url= is the icon URL, so it reaches us whole even when its own
+                # query string wasn't encoded; size has to come before it.
+                options, _, favicon_url = self.path.split('?', 1)[1].partition('url=')
                 favicon_url = urllib.parse.unquote(favicon_url)
+                size = urllib.parse.parse_qs(options).get('size', [None])[0]
                 
-                # Check cache first
-                if favicon_url in self.favicon_cache:
-                    cached_data = self.favicon_cache[favicon_url]
-                    self.send_response(200)
-                    self.send_header('Content-type', cached_data['content_type'])
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(base64.b64decode(cached_data['data']))
-                    return
-                
-                # Create headers with a fake user agent
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                
-                # Make the request to get the favicon
-                req = urllib.request.Request(favicon_url, headers=headers)
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    content_type = response.headers.get('Content-type', 'image/x-icon')
-                    icon_data = response.read()
-                    
-                    # Cache the favicon
-                    self.favicon_cache[favicon_url] = {
-                        'content_type': content_type,
-                        'data': base64.b64encode(icon_data).decode('utf-8')
-                    }
-                    
-                    # Send response
-                    self.send_response(200)
-                    self.send_header('Content-type', content_type)
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(icon_data)
+                content_type, icon_data = self.read_icon(favicon_url, size)
+                self.send_response(200)
+                self.send_header('Content-type', content_type)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(icon_data)
                     
+            except BackingOff as e:
+                # Failed lately - answer at once with the fallback, which the browser may keep until the retry
+                self.send_fallback_icon(max_age=int(e.retry_after))
+            except FetchPending:
+                # Slow host - the fallback for now, not to be cached; the icon is stored by the time it's asked for again
+                self.send_fallback_icon(max_age=0)
             except Exception as e:
                 print(f"Error proxying favicon: {e}")
                 self.send_error(404)
                 
+        elif self.path == '/favicon-cache-stats':
+            body = json.dumps({"memory": self.favicon_cache.stats(), "disk": get_favicon_store().stats()}).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
         elif self.path == '/popup.html':
             self.send_response(200)
             self.send_header('Content-type', 'text/html')
@@ -330,12 +469,35 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                 </div>
                 <script>
                     let ws = new WebSocket('ws://localhost:8765');
-                    const whiteIcons = new Map();
-                    const canvas = document.createElement('canvas');
-                    const ctx = canvas.getContext('2d');
+                    // favIconUrl -> {white, color}, analyzed once by the server when it fetched the icon
+                    const iconInfo = new Map();
+                    // favIconUrl -> object URL of the icon loaded through /favicon-bundle
+                    const iconSources = new Map();
+                    // favIconUrl -> img elements waiting for the next bundle
+                    const pendingIcons = new Map();
+                    let iconBundleScheduled = false;
+                    // Normalized PNG size to ask for; 32px keeps icons sharp on high-DPI screens
+                    const ICON_SIZE = window.devicePixelRatio > 1 ? 32 : 16;
                     let currentFilter = 'all';
                     let allTabs = [];
+                    // Tab state mirrored from the server: full snapshot once, then seq-numbered patches
+                    const tabsByKey = new Map();
+                    // browser -> tab keys in display order, and the browsers in display order
+                    const orderByBrowser = new Map();
+                    let tabGroups = [];
+                    let stateSeq = null;
+                    let resyncPending = false;
                     let availableBrowsers = new Set(['all']);
+                    // With this many tabs the popup follows a window of the server's view instead of every tab
+                    const VIEWPORT_MIN_TABS = 500;
+                    const VIEWPORT_ROW_HEIGHT = 54;  // .tab-item height plus the gap between rows
+                    const VIEWPORT_OVERSCAN = 20;
+                    // {id, offset, limit} of the current subscription, its rows and total, or null when not subscribed
+                    let viewport = null;
+                    let viewportId = 0;
+                    let viewportRows = [];
+                    let viewportOffset = 0;
+                    let viewportTotal = 0;
                     
                     function detectBrowser(tab) {
                         if (tab.url.includes('chrome-extension://')) return 'Chrome';
@@ -380,97 +542,24 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                         });
                     }
 
-                    function isIconWhite(img) {
-                        const canvas = document.createElement('canvas');
-                        const ctx = canvas.getContext('2d');
-                        
-                        canvas.width = img.width;
-                        canvas.height = img.height;
-                        
-                        try {
-                            ctx.drawImage(img, 0, 0);
-                            const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height);
-                            const data = imageData.data;
-                            
-                            let whitePixels = 0;
-                            let totalPixels = 0;
-                            
-                            for (let i = 0; i < data.length; i += 4) {
-                                const r = data[i];
-                                const g = data[i + 1];
-                                const b = data[i + 2];
-                                const a = data[i + 3];
-                                
-                                if (a > 0) {
-                                    totalPixels++;
-                                    if (r > 245 && g > 245 && b > 245) {
-                                        whitePixels++;
-                                    }
-                                }
-                            }
-                            
-                            return totalPixels > 0 && whitePixels / totalPixels > 0.9;
-                        } catch (error) {
-                            console.log('Error analyzing icon:', error);
-                            return false;
-                        } finally {
-                            canvas.remove();
-                        }
-                    }
-
-                    function checkIfWhiteIcon(tab) {
-                        if (!tab.favIconUrl) return;
-                        
-                        // Create a proxy URL for the favicon through our server
-                        const proxyUrl = `/proxy-favicon?url=${encodeURIComponent(tab.favIconUrl)}`;
-                        
-                        const img = new Image();
-                        img.onload = () => {
-                            const isWhite = isIconWhite(img);
-                            whiteIcons.set(tab.id, isWhite);
-                            updateTabList(allTabs);
-                        };
-                        img.onerror = () => {
-                            whiteIcons.set(tab.id, false);
-                        };
-                        img.src = proxyUrl;
+                    // Tabs of one browser in the order the server keeps them in
+                    function orderedTabs(browser) {
+                        return (orderByBrowser.get(browser) || []).map(key => tabsByKey.get(key));
                     }
 
                     function updateTabList(tabs) {
                         allTabs = tabs;
-                        let filteredTabs;
-                        
-                        if (currentFilter === 'all') {
-                            // For 'all' view, combine all tabs and sort by browser and title
-                            filteredTabs = tabs.sort((a, b) => {
-                                // First sort by browser
-                                const browserCompare = a.browser.localeCompare(b.browser);
-                                if (browserCompare !== 0) return browserCompare;
-                                // Then by title within each browser
-                                return a.title.localeCompare(b.title);
-                            });
-                        } else {
-                            // For specific browser view, filter and sort by title
-                            filteredTabs = tabs
-                                .filter(tab => tab.browser === currentFilter)
-                                .sort((a, b) => a.title.localeCompare(b.title));
-                        }
                         
                         const tabList = document.getElementById('tabList');
+                        tabList.className = 'tab-grid';
+                        tabList.style.height = '';
                         tabList.innerHTML = '';
                         
                         if (currentFilter === 'all') {
-                            // Group tabs by browser
-                            const browserGroups = {};
-                            filteredTabs.forEach(tab => {
-                                if (!browserGroups[tab.browser]) {
-                                    browserGroups[tab.browser] = [];
-                                }
-                                browserGroups[tab.browser].push(tab);
-                            });
-                            
-                            // Create sections for each browser
-                            Object.entries(browserGroups).forEach(([browser, browserTabs]) => {
+                            // Create sections for each browser, already grouped and sorted by the server
+                            tabGroups.forEach(browser => {
+                                const browserTabs = orderedTabs(browser);
+                                if (browserTabs.length === 0) return;
                                 const browserSection = document.createElement('div');
                                 browserSection.className = 'browser-section';
                                 
@@ -492,7 +581,7 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                             });
                         } else {
                             // Regular tab list for specific browser view
-                            filteredTabs.forEach(tab => {
+                            orderedTabs(currentFilter).forEach(tab => {
                                 const tabElement = createTabElement(tab);
                                 tabList.appendChild(tabElement);
                             });
@@ -506,7 +595,8 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                             ws.send(JSON.stringify({
                                 type: 'activate_tab',
                                 tabId: tab.id,
-                                windowId: tab.windowId
+                                windowId: tab.windowId,
+                                browser: tab.browser
                             }));
                         };
                         
@@ -514,26 +604,21 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                         const imgElement = document.createElement('img');
                         imgElement.width = 16;
                         imgElement.height = 16;
+                        imgElement.className = 'favicon';
                         
                         if (tab.favIconUrl) {
-                            // Use our proxy for external URLs
-                            const proxyUrl = `/proxy-favicon?url=${encodeURIComponent(tab.favIconUrl)}`;
-                            imgElement.src = proxyUrl;
+                            // Loaded through our proxy, together with every other icon on screen
+                            setFavicon(imgElement, tab.favIconUrl);
                             
-                            // Analyze the icon
-                            const testImg = new Image();
-                            testImg.onload = () => {
-                                const isWhite = isIconWhite(testImg);
-                                if (isWhite) {
-                                    imgElement.classList.add('recolor-black');
-                                }
-                            };
-                            testImg.src = proxyUrl;
+                            // Mostly-white icons would vanish on the white background
+                            const info = tab.icon || iconInfo.get(tab.favIconUrl);
+                            if (info && info.white) {
+                                imgElement.classList.add('recolor-black');
+                            }
                         } else {
                             imgElement.src = '/static/fallback.svg';
                         }
                         
-                        imgElement.className = 'favicon';
                         imgElement.onerror = function() {
                             this.src = '/static/fallback.svg';
                         };
@@ -572,20 +657,152 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                             grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
                             gap: 10px;
                         }
+                        .viewport-list {
+                            position: relative;
+                        }
+                        .viewport-list .tab-item {
+                            position: absolute;
+                            left: 0;
+                            right: 0;
+                        }
                     `;
                     document.head.appendChild(style);
 
+                    function setFavicon(imgElement, favIconUrl) {
+                        const source = iconSources.get(favIconUrl);
+                        if (source) {
+                            imgElement.src = source;
+                            return;
+                        }
+                        if (!pendingIcons.has(favIconUrl)) pendingIcons.set(favIconUrl, []);
+                        pendingIcons.get(favIconUrl).push(imgElement);
+                        if (!iconBundleScheduled) {
+                            // Gather the icons of the whole render into one request
+                            iconBundleScheduled = true;
+                            setTimeout(loadIconBundle, 0);
+                        }
+                    }
+                    
+                    // The server answers with a 4-byte header length, a JSON header of {url, type, offset, length}, then the icons' bytes
+                    async function loadIconBundle() {
+                        iconBundleScheduled = false;
+                        const waiting = new Map(pendingIcons);
+                        pendingIcons.clear();
+                        try {
+                            const response = await fetch('/favicon-bundle', {
+                                method: 'POST',
+                                headers: { 'Content-Type': 'application/json' },
+                                body: JSON.stringify({ urls: Array.from(waiting.keys()), size: ICON_SIZE })
+                            });
+                            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                            const buffer = await response.arrayBuffer();
+                            const headerLength = new DataView(buffer).getUint32(0);
+                            const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+                            const start = 4 + headerLength;
+                            header.icons.forEach(icon => {
+                                if (!icon.type || iconSources.has(icon.url)) return;
+                                const blob = new Blob([new Uint8Array(buffer, start + icon.offset, icon.length)], { type: icon.type });
+                                iconSources.set(icon.url, URL.createObjectURL(blob));
+                            });
+                        } catch (error) {
+                            console.log('Error loading favicons:', error);
+                        }
+                        // Icons that failed get the fallback now and are asked for again on the next render
+                        waiting.forEach((images, url) => {
+                            const source = iconSources.get(url) || '/static/fallback.svg';
+                            images.forEach(imgElement => { imgElement.src = source; });
+                        });
+                    }
+
                     ws.onopen = function() {
                         connectionStatus.textContent = 'Connected';
                         connectionStatus.classList.remove('offline');
                         connectionStatus.classList.add('connected');
+                        // The popup decodes JSON only; offering it still lets the server confirm what it speaks
+                        ws.send(JSON.stringify({ type: 'hello', codecs: ['json'] }));
                     };
 
+                    function applyTabsPatch(patch) {
+                        const takeOut = key => {
+                            const tab = tabsByKey.get(key);
+                            const order = tab && orderByBrowser.get(tab.browser);
+                            const index = order ? order.indexOf(key) : -1;
+                            if (index >= 0) order.splice(index, 1);
+                        };
+                        patch.removed.forEach(key => {
+                            takeOut(key);
+                            tabsByKey.delete(key);
+                        });
+                        patch.added.forEach(tab => tabsByKey.set(tab.key, tab));
+                        patch.changed.forEach(change => {
+                            const tab = tabsByKey.get(change.key);
+                            if (tab) {
+                                Object.assign(tab, change.fields);
+                            }
+                        });
+                        // Moves come in display order: take every moved tab out, then put each after its predecessor
+                        const moves = patch.moves || [];
+                        moves.forEach(([key]) => takeOut(key));
+                        moves.forEach(([key, after]) => {
+                            const tab = tabsByKey.get(key);
+                            if (!tab) return;
+                            if (!orderByBrowser.has(tab.browser)) orderByBrowser.set(tab.browser, []);
+                            const order = orderByBrowser.get(tab.browser);
+                            order.splice(after === null ? 0 : order.indexOf(after) + 1, 0, key);
+                        });
+                        if (patch.groups) tabGroups = patch.groups;
+                        Object.entries(patch.icons || {}).forEach(([url, info]) => iconInfo.set(url, info));
+                    }
+
                     ws.onmessage = function(event) {
                         const data = JSON.parse(event.data);
                         if (data.type === 'tabs_update') {
+                            tabsByKey.clear();
+                            orderByBrowser.clear();
+                            iconInfo.clear();
+                            Object.entries(data.icons || {}).forEach(([url, info]) => iconInfo.set(url, info));
+                            data.tabs.forEach(tab => {
+                                const key = tab.key || `${tab.browser}:${tab.id}`;
+                                tabsByKey.set(key, tab);
+                                if (!orderByBrowser.has(tab.browser)) orderByBrowser.set(tab.browser, []);
+                                orderByBrowser.get(tab.browser).push(key);
+                            });
+                            tabGroups = data.groups || Array.from(orderByBrowser.keys());
+                            stateSeq = data.seq;
+                            resyncPending = false;
                             updateBrowserFilters(data.browsers || ['all']);
-                            updateTabList(data.tabs);
+                            if (data.tabs.length >= VIEWPORT_MIN_TABS) {
+                                subscribeViewport(true);
+                            } else {
+                                updateTabList(Array.from(tabsByKey.values()));
+                            }
+                        } else if (data.type === 'tabs_patch') {
+                            // Already covered by a snapshot that was sent after this patch was queued
+                            if (resyncPending || (stateSeq !== null && data.seq <= stateSeq)) return;
+                            if (stateSeq === null || data.seq !== stateSeq + 1) {
+                                // Missed a patch - ask the server for a fresh snapshot
+                                resyncPending = true;
+                                ws.send(JSON.stringify({ type: 'resync', seq: stateSeq }));
+                                return;
+                            }
+                            applyTabsPatch(data);
+                            stateSeq = data.seq;
+                            updateBrowserFilters(data.browsers || ['all']);
+                            updateTabList(Array.from(tabsByKey.values()));
+                        } else if (data.type === 'search_result') {
+                            // Drop answers to queries the user has already typed past
+                            if (data.id === searchId && searchInput.value.trim()) {
+                                renderSearchResults(data.results);
+                            }
+                        } else if (data.type === 'viewport') {
+                            // Replies to an older subscription are superseded by the full window of the new one
+                            if (viewport && data.id === viewport.id) {
+                                applyViewport(data);
+                            }
+                        } else if (data.type === 'hello') {
+                            console.log(`Server codec ${data.codec} (supports ${data.codecs.join(', ')})`);
+                        } else if (data.type === 'activate_result') {
+                            console.log(`Activated ${data.browser} tab ${data.tabId} in ${data.latencyMs} ms (ok: ${data.ok})`);
                         }
                     };
 
@@ -601,31 +818,142 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
 
                     const searchInput = document.getElementById('searchInput');
                     
-                    function highlightText(text, searchTerm) {
-                        if (!searchTerm) return text;
-                        const regex = new RegExp(`(${searchTerm})`, 'gi');
-                        return text.replace(regex, '<span class="highlight">$1</span>');
+                    // Search runs on the server; the popup only renders the ranked results it returns
+                    let searchId = 0;
+                    
+                    function setHighlightedText(element, text, spans) {
+                        element.textContent = '';
+                        let last = 0;
+                        spans.forEach(([start, end]) => {
+                            element.appendChild(document.createTextNode(text.slice(last, start)));
+                            const mark = document.createElement('span');
+                            mark.className = 'highlight';
+                            mark.textContent = text.slice(start, end);
+                            element.appendChild(mark);
+                            last = end;
+                        });
+                        element.appendChild(document.createTextNode(text.slice(last)));
                     }
                     
-                    function filterTabs() {
-                        const searchTerm = searchInput.value.toLowerCase();
+                    function renderSearchResults(results) {
+                        const tabList = document.getElementById('tabList');
+                        tabList.className = 'tab-grid';
+                        tabList.style.height = '';
+                        tabList.innerHTML = '';
+                        results.forEach(result => {
+                            const tabElement = createTabElement(result.tab);
+                            setHighlightedText(tabElement.querySelector('.tab-title'), result.tab.title || '', result.titleSpans);
+                            tabElement.title = result.tab.url || '';
+                            tabList.appendChild(tabElement);
+                        });
+                    }
+                    
+                    // Offline fallback: plain substring match over the tabs already rendered
+                    function filterTabsLocally(searchTerm) {
                         const tabElements = document.querySelectorAll('.tab-item');
                         
                         tabElements.forEach(tabElement => {
-                            const title = tabElement.querySelector('.tab-title').textContent.toLowerCase();
-                            const matches = title.includes(searchTerm);
+                            const titleElement = tabElement.querySelector('.tab-title');
+                            const title = titleElement.textContent;
+                            const pos = title.toLowerCase().indexOf(searchTerm);
                             
-                            if (matches) {
+                            if (pos >= 0) {
                                 tabElement.classList.remove('hidden');
-                                // Highlight matching text
-                                const titleElement = tabElement.querySelector('.tab-title');
-                                titleElement.innerHTML = highlightText(titleElement.textContent, searchTerm);
+                                setHighlightedText(titleElement, title, searchTerm ? [[pos, pos + searchTerm.length]] : []);
                             } else {
                                 tabElement.classList.add('hidden');
                             }
                         });
                     }
                     
+                    // Rows the container currently shows, counted from the top of the list
+                    function visibleRows() {
+                        const container = document.getElementById('container');
+                        const tabList = document.getElementById('tabList');
+                        return {
+                            first: Math.max(0, Math.floor((container.scrollTop - tabList.offsetTop) / VIEWPORT_ROW_HEIGHT)),
+                            count: Math.ceil(container.clientHeight / VIEWPORT_ROW_HEIGHT)
+                        };
+                    }
+                    
+                    // Ask the server for the rows around what is on screen; a new view (query or browser) starts over
+                    function subscribeViewport(newView) {
+                        if (ws.readyState !== WebSocket.OPEN) return;
+                        const rows = visibleRows();
+                        const offset = Math.max(0, rows.first - VIEWPORT_OVERSCAN);
+                        const limit = rows.count + 2 * VIEWPORT_OVERSCAN;
+                        if (newView || !viewport) viewportId++;
+                        viewport = { id: viewportId, offset: offset, limit: limit };
+                        ws.send(JSON.stringify({
+                            type: 'subscribe',
+                            id: viewportId,
+                            query: searchInput.value.trim(),
+                            browser: currentFilter === 'all' ? null : currentFilter,
+                            offset: offset,
+                            limit: limit
+                        }));
+                    }
+                    
+                    function applyViewport(data) {
+                        // The server sends only tabs that are new to the window or changed; both sides keep just the window
+                        const tabs = new Map(viewportRows.map(tab => [tab.key, tab]));
+                        data.tabs.forEach(tab => tabs.set(tab.key, tab));
+                        viewportRows = data.keys.map(key => tabs.get(key));
+                        viewportOffset = data.offset;
+                        viewportTotal = data.total;
+                        if (currentFilter === 'all' && !searchInput.value.trim() && viewportTotal < VIEWPORT_MIN_TABS / 2) {
+                            // Few enough tabs again - go back to the full list, which the server sends on unsubscribe
+                            viewport = null;
+                            viewportRows = [];
+                            ws.send(JSON.stringify({ type: 'unsubscribe' }));
+                            return;
+                        }
+                        renderViewport();
+                    }
+                    
+                    function renderViewport() {
+                        const tabList = document.getElementById('tabList');
+                        tabList.className = 'viewport-list';
+                        tabList.innerHTML = '';
+                        tabList.style.height = `${viewportTotal * VIEWPORT_ROW_HEIGHT}px`;
+                        viewportRows.forEach((tab, index) => {
+                            const tabElement = createTabElement(tab);
+                            if (tab.titleSpans) {
+                                setHighlightedText(tabElement.querySelector('.tab-title'), tab.title || '', tab.titleSpans);
+                            }
+                            tabElement.style.top = `${(viewportOffset + index) * VIEWPORT_ROW_HEIGHT}px`;
+                            tabList.appendChild(tabElement);
+                        });
+                    }
+                    
+                    document.getElementById('container').addEventListener('scroll', () => {
+                        if (!viewport) return;
+                        const offset = Math.max(0, visibleRows().first - VIEWPORT_OVERSCAN);
+                        if (Math.abs(offset - viewport.offset) >= VIEWPORT_OVERSCAN / 2) {
+                            subscribeViewport(false);
+                        }
+                    });
+                    
+                    function filterTabs() {
+                        const query = searchInput.value.trim();
+                        if (viewport) {
+                            subscribeViewport(true);
+                        } else if (!query) {
+                            originalUpdateTabList(allTabs);
+                        } else if (ws.readyState === WebSocket.OPEN) {
+                            ws.send(JSON.stringify({
+                                type: 'search',
+                                id: ++searchId,
+                                query: query,
+                                limit: 50,
+                                browser: currentFilter === 'all' ? null : currentFilter
+                            }));
+                        } else {
+                            originalUpdateTabList(allTabs);
+                            filterTabsLocally(query.toLowerCase());
+                        }
+                    }
+                    
                     searchInput.addEventListener('input', filterTabs);
                     searchInput.addEventListener('keydown', (e) => {
                         if (e.key === 'Enter') {
@@ -638,7 +966,8 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
                     
                     const originalUpdateTabList = updateTabList;
                     updateTabList = function(tabs) {
-                        originalUpdateTabList(tabs);
+                        allTabs = tabs;
+                        // While searching, tab changes re-run the search instead of showing every tab
                         filterTabs();
                     };
                 </script>
@@ -648,14 +977,7 @@ class ExtensionHandler(SimpleHTTPRequestHandler):
             
             self.wfile.write(html_content.encode())
         elif self.path == '/static/fallback.svg':
-            self.send_response(200)
-            self.send_header('Content-type', 'image/svg+xml')
-            self.end_headers()
-            
-            # Get the correct path for both development and executable
-            fallback_path = self.get_static_file_path('fallback.svg')
-            with open(fallback_path, 'rb') as f:
-                self.wfile.write(f.read())
+            self.send_fallback_icon()
         elif self.path == '/favicon.ico':
             self.send_response(200)
             self.send_header('Content-type', 'image/x-icon')
@@ -673,7 +995,10 @@ def start_http_server():
     if not getattr(sys, 'frozen', False):
         os.makedirs('static', exist_ok=True)
     
-    server = HTTPServer(('localhost', 8000), ExtensionHandler)
+    # Icons the disk store re-downloads in the background replace the copies held in memory
+    get_favicon_store().on_change = ExtensionHandler.favicon_changed
+    
+    server = PooledHTTPServer(('localhost', 8000), ExtensionHandler)
     server.serve_forever()
 
 def run_http_server():
@@ -0,0 +1,434 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+import itertools
+import math
+import re
+
+# Words for the prefix and typo indexes: runs of letters and digits
+WORD_RE = re.compile(r'[^\W_]+')
+
+# Query terms shorter than this are looked up in the word-prefix index instead of by trigram
+TRIGRAM_MIN = 3
+# Terms at least this long also match words with a typo when exact matches run short
+FUZZY_MIN = 5
+# Typos allowed per term: one, or two from 8 letters on
+FUZZY_EDITS = lambda term: 1 if len(term) < 8 else 2
+# Words checked by edit distance per term, and words accepted
+FUZZY_MAX_CHECKED = 64
+FUZZY_MAX_WORDS = 8
+
+# Most frecent tabs looked at first, so stopping early keeps the most used equally good matches
+FRECENT_FIRST = 256
+
+# Scores per term; a tab's score is the sum over all query terms
+TITLE_SCORE = 10.0
+URL_SCORE = 5.0
+HOST_BONUS = 2.0
+WORD_START_BONUS = 4.0
+FUZZY_SCORE = 4.0
+# The best a single term can score: at the start of a title word
+BEST_TERM_SCORE = TITLE_SCORE + WORD_START_BONUS
+
+_EMPTY = frozenset()
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def strip_url(url):
+    """Lowercased URL without scheme and www., plus where that part starts in the original"""
+    url = url or ''
+    start = url.find('://')
+    start = start + 3 if start >= 0 else 0
+    if url.startswith('www.', start):
+        start += 4
+    return url[start:].lower(), start
+
+def prefix_edit_distance(term, word, max_edits):
+    """Levenshtein distance from term to the closest start of word, or max_edits + 1 if over"""
+    word = word[:len(term) + max_edits]
+    previous = list(range(len(word) + 1))
+    for i, char in enumerate(term, 1):
+        current = [i]
+        for j, other in enumerate(word, 1):
+            cost = previous[j - 1] + (char != other)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current.append(cost)
+        if min(current) > max_edits:
+            return max_edits + 1
+        previous = current
+    return min(previous[max(0, len(term) - max_edits):])
+
+def find_word(text, term):
+    """Position of term in text, preferring an occurrence at a word start; (-1, False) if absent"""
+    pos = first = text.find(term)
+    while pos > 0 and text[pos - 1].isalnum():
+        pos = text.find(term, pos + 1)
+    if pos >= 0:
+        return pos, True
+    return first, False
+
+def _add(index, key, value):
+    values = index.get(key)
+    if values is None:
+        values = index[key] = set()
+    values.add(value)
+
+def _discard(index, key, value):
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
+
+def _merge_spans(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+class SearchText:
+    """What the index keeps per tab: lowercased title and URL plus how to map spans back"""
+
+    __slots__ = ('title', 'url', 'url_offset', 'host_end', 'title_spans', 'url_spans')
+
+    def __init__(self, record):
+        title = record.title or ''
+        self.title = title.lower()
+        self.url, self.url_offset = strip_url(record.url)
+        host_end = self.url.find('/')
+        self.host_end = host_end if host_end >= 0 else len(self.url)
+        # Lowercasing changes the length of a few characters (e.g. U+0130); no spans then
+        self.title_spans = len(self.title) == len(title)
+        self.url_spans = len(self.url) + self.url_offset == len(record.url or '')
+
+    def words(self):
+        """Title words and host labels - what a typo is matched against"""
+        return set(WORD_RE.findall(self.title)) | set(WORD_RE.findall(self.url[:self.host_end]))
+
+class SearchResults:
+    """Every tab matching a query, ranked best first, from SearchIndex.search_all().
+
+    Highlight spans cost more than ranking, so they are only worked out for
+    the slice of rows actually asked for: results[offset:offset + limit] is
+    a list of (score, record, title spans, url spans) like search() returns.
+    """
+
+    def __init__(self, index, terms, fuzzy, ranked):
+        self._index = index
+        self._terms = terms
+        self._fuzzy = fuzzy
+        # [(score, record)], best first
+        self._ranked = ranked
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def __getitem__(self, rows):
+        texts = self._index._texts
+        return [(score, record) + self._index._spans(record, texts[record], self._terms, self._fuzzy)
+                for score, record in self._ranked[rows]]
+
+class SearchIndex:
+    """Incrementally maintained fuzzy search over tab titles, URLs and domains.
+
+    The index listens to a TabStore and keeps, per tab, the lowercased title
+    and URL (without scheme and www.). Exact terms are found through an
+    inverted index of character trigrams: a term's candidates are the
+    intersection of its trigram posting sets, smallest first, so selective
+    terms only ever touch a handful of tabs. Terms of one or two letters use
+    an index of word prefixes instead.
+
+    Typos are matched against the vocabulary of title words and host labels
+    rather than against every tab: a trigram index over distinct words finds
+    the words that share most trigrams with the term, and their tabs match
+    with a lower score. This only runs when exact matching finds fewer than
+    `limit` tabs.
+
+    Every term must match. Exact matches score by field (title above URL,
+    host above path), word start and position. Ranking stops early once
+    `limit` tabs reach the best score the query allows, so broad queries like
+    a single letter don't score every tab. With a ranking (a FrecencyIndex),
+    equal scores go to the more frecent tab, and frecent tabs are scored
+    first so stopping early doesn't lose them.
+    """
+
+    def __init__(self, store=None, ranking=None):
+        # TabRecord -> SearchText as of when it was indexed
+        self._texts = {}
+        # trigram of a title or URL -> {TabRecord}
+        self._trigrams = {}
+        # one- or two-letter word prefix -> {TabRecord}
+        self._prefixes = {}
+        # title word or host label -> {TabRecord}, and trigram -> {word} over those words
+        self._words = {}
+        self._word_trigrams = {}
+        self.ranking = ranking
+        self.searches = 0
+        if store is not None:
+            for record in store.all_tabs():
+                self.tab_added(record)
+            store.add_listener(self)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _keys(self, text):
+        grams = trigrams(text.title) | trigrams(text.url)
+        prefixes = set()
+        for field in (text.title, text.url):
+            for word in WORD_RE.findall(field):
+                prefixes.add(word[:1])
+                prefixes.add(word[:2])
+        return grams, prefixes, text.words()
+
+    def tab_added(self, record):
+        text = self._texts[record] = SearchText(record)
+        grams, prefixes, words = self._keys(text)
+        for gram in grams:
+            _add(self._trigrams, gram, record)
+        for prefix in prefixes:
+            _add(self._prefixes, prefix, record)
+        for word in words:
+            if word not in self._words:
+                for gram in trigrams(word):
+                    _add(self._word_trigrams, gram, word)
+            _add(self._words, word, record)
+
+    def tab_removed(self, record):
+        text = self._texts.pop(record, None)
+        if text is None:
+            return
+        grams, prefixes, words = self._keys(text)
+        for gram in grams:
+            _discard(self._trigrams, gram, record)
+        for prefix in prefixes:
+            _discard(self._prefixes, prefix, record)
+        for word in words:
+            _discard(self._words, word, record)
+            if word not in self._words:
+                for gram in trigrams(word):
+                    _discard(self._word_trigrams, gram, word)
+
+    def _postings(self, term):
+        """Posting sets whose intersection holds every tab that can contain term"""
+        if len(term) < TRIGRAM_MIN:
+            return [self._prefixes.get(term, _EMPTY)]
+        return [self._trigrams.get(gram, _EMPTY) for gram in trigrams(term)]
+
+    @staticmethod
+    def _intersect(postings):
+        """Intersect posting sets smallest first, so each step only walks the candidates left.
+
+        The result is a superset of the real matches (trigrams can be present
+        without being adjacent); scoring checks every candidate again.
+        """
+        postings = sorted(postings, key=len)
+        candidates = postings[0]
+        for records in postings[1:]:
+            if not candidates:
+                break
+            candidates = candidates & records
+        return candidates
+
+    def _fuzzy_words(self, term):
+        """[(score, word)] for words within an edit or two of term (or of their start), best first"""
+        grams = trigrams(term)
+        # One edit breaks at most 3 trigrams, so a close word keeps one of any 4 of them
+        postings = sorted((self._word_trigrams.get(gram, _EMPTY) for gram in grams), key=len)[:4]
+        needed = max(1, len(grams) - 3 * FUZZY_EDITS(term))
+        shared = []
+        for word in set().union(*postings):
+            if term in word:
+                # Contains the term itself - already an exact match
+                continue
+            overlap = len(grams & trigrams(word))
+            if overlap >= needed:
+                shared.append((overlap, word))
+        # Only the words sharing the most trigrams get the (slower) edit distance check
+        shared.sort(reverse=True)
+        max_edits = FUZZY_EDITS(term)
+        matches = []
+        for _, word in shared[:FUZZY_MAX_CHECKED]:
+            distance = prefix_edit_distance(term, word, max_edits)
+            if distance <= max_edits:
+                matches.append((FUZZY_SCORE / (1 + distance), word))
+                if len(matches) >= FUZZY_MAX_WORDS:
+                    break
+        matches.sort(reverse=True)
+        return matches
+
+    def _fuzzy_match(self, record, words):
+        """(score, word) of the best typo match of a tab among words, or None"""
+        for score, word in words:
+            if record in self._words[word]:
+                return score, word
+        return None
+
+    @staticmethod
+    def _match(text, term):
+        """Where term matches a tab exactly: (score, in title, position) or None"""
+        title = text.title
+        pos = title.find(term)
+        if pos >= 0:
+            if pos == 0 or not title[pos - 1].isalnum():
+                return TITLE_SCORE + WORD_START_BONUS, True, pos
+            pos, word_start = find_word(title, term)
+            if word_start:
+                return TITLE_SCORE + WORD_START_BONUS, True, pos
+            if len(term) >= TRIGRAM_MIN:
+                return TITLE_SCORE - min(pos, 100) * 0.01, True, pos
+        pos, word_start = find_word(text.url, term)
+        if pos < 0 or not (word_start or len(term) >= TRIGRAM_MIN):
+            return None
+        score = URL_SCORE + (WORD_START_BONUS if word_start else -min(pos, 100) * 0.01)
+        return score + (HOST_BONUS if pos < text.host_end else 0.0), False, pos
+
+    def _score(self, record, text, terms, fuzzy):
+        """Sum of the term scores for one tab, or None if a term doesn't match"""
+        score = 0.0
+        match = self._match
+        for term in terms:
+            found = match(text, term)
+            if found is None:
+                found = self._fuzzy_match(record, fuzzy.get(term, ()))
+                if found is None:
+                    return None
+            score += found[0]
+        return score
+
+    def _spans(self, record, text, terms, fuzzy):
+        """Spans to highlight in the original title and URL for a ranked tab"""
+        title_spans, url_spans = [], []
+        for term in terms:
+            found = self._match(text, term)
+            if found is not None:
+                _, in_title, pos = found
+                (title_spans if in_title else url_spans).append((pos, pos + len(term)))
+                continue
+            # Highlight the word that matched with a typo
+            word = self._fuzzy_match(record, fuzzy[term])[1]
+            pos, _ = find_word(text.title, word)
+            if pos >= 0:
+                title_spans.append((pos, pos + len(word)))
+                continue
+            pos, _ = find_word(text.url, word)
+            if pos >= 0:
+                url_spans.append((pos, pos + len(word)))
+        title_spans = _merge_spans(title_spans) if text.title_spans else []
+        url_spans = [[start + text.url_offset, end + text.url_offset]
+                     for start, end in _merge_spans(url_spans)] if text.url_spans else []
+        return title_spans, url_spans
+
+    def _rank(self, candidates, terms, fuzzy, limit, browser, best_possible):
+        """Top `limit` of candidates, stopping early once that many reach best_possible"""
+        texts = self._texts
+        score_tab = self._score
+        scored = []
+        at_best = 0
+        order = candidates
+        if self.ranking is not None and len(self.ranking):
+            frecent = [record for record in self.ranking.ranked(FRECENT_FIRST) if record in candidates]
+            if frecent:
+                first = set(frecent)
+                order = itertools.chain(frecent, (record for record in candidates if record not in first))
+        for record in order:
+            if browser is not None and record.browser != browser:
+                continue
+            score = score_tab(record, texts[record], terms, fuzzy)
+            if score is None:
+                continue
+            scored.append((score, record))
+            if score >= best_possible:
+                at_best += 1
+                if at_best >= limit:
+                    break
+        return heapq.nlargest(limit, scored, key=self._rank_key)
+
+    def _rank_key(self, item):
+        if self.ranking is None:
+            return item[0], 0.0
+        frecency = self.ranking.score(item[1].key)
+        return item[0], -math.inf if frecency is None else frecency
+
+    def search(self, query, limit=20, browser=None):
+        """Top `limit` tabs for a query as (score, record, title spans, url spans), best first"""
+        terms, fuzzy, results = self._find(query, limit, browser)
+        return [(score, record) + self._spans(record, self._texts[record], terms, fuzzy)
+                for score, record in results]
+
+    def search_all(self, query, browser=None):
+        """SearchResults with every tab matching a query, exact and typo matches alike"""
+        return SearchResults(self, *self._find(query, len(self._texts), browser))
+
+    def _find(self, query, limit, browser):
+        """(terms, typo words per term, top `limit` [(score, record)]) for a query"""
+        self.searches += 1
+        terms = sorted(set((query or '').lower().split()), key=len, reverse=True)
+        if not terms or limit <= 0:
+            return terms, {}, []
+
+        postings = {term: self._postings(term) for term in terms}
+        candidates = self._intersect([records for term in terms for records in postings[term]])
+        fuzzy = {}
+        results = []
+        if candidates:
+            results = self._rank(candidates, terms, fuzzy, limit, browser, BEST_TERM_SCORE * len(terms))
+
+        if len(results) < limit:
+            # Not enough exact matches - let the longer terms match words with a typo
+            fuzzy = {term: self._fuzzy_words(term) for term in terms if len(term) >= FUZZY_MIN}
+            fuzzy = {term: words for term, words in fuzzy.items() if words}
+            if fuzzy:
+                widened = []
+                best = {}
+                for term in terms:
+                    if term in fuzzy:
+                        records = self._intersect(postings[term])
+                        widened.append(records.union(*(self._words[word] for _, word in fuzzy[term])))
+                        best[term] = (BEST_TERM_SCORE if records else 0.0, fuzzy[term][0][0])
+                    else:
+                        widened.extend(postings[term])
+                        best[term] = (BEST_TERM_SCORE, 0.0)
+                # Every exact match is already in results, so each new tab matches some term only
+                # with a typo; that caps what the new tabs can score
+                exact_total = sum(exact for exact, _ in best.values())
+                best_possible = max(exact_total - best[term][0] + best[term][1] for term in fuzzy)
+                more = self._intersect(widened)
+                if results:
+                    more = more - {record for _, record in results}
+                results = heapq.nlargest(
+                    limit,
+                    results + self._rank(more, terms, fuzzy, limit - len(results), browser, best_possible),
+                    key=self._rank_key)
+        return terms, fuzzy, results
@@ -0,0 +1,453 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import sys
+from array import array
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Fields covered by the per-browser digest - must match DIGEST_FIELDS in background.js
+DIGEST_FIELDS = ('id', 'windowId', 'url', 'title', 'favIconUrl')
+
+# Fields a tab_updated event is allowed to change
+UPDATABLE_FIELDS = ('title', 'url', 'favIconUrl', 'windowId')
+
+# Query parameters that only say where a visit came from, not which page it is
+TRACKING_PARAMS = frozenset((
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref_src', 'ref_url', 'si',
+))
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+def tab_key(browser, tab_id):
+    """Build the key that identifies a tab across all browsers on the wire"""
+    return f"{browser}:{tab_id}"
+
+def tab_digest(tab):
+    """32-bit FNV-1a over the UTF-16 code units of the digest fields (same as background.js)"""
+    text = '|'.join('' if tab.get(field) is None else str(tab.get(field)) for field in DIGEST_FIELDS)
+    units = array('H', text.encode('utf-16-le'))
+    if sys.byteorder == 'big':
+        units.byteswap()
+    digest = 0x811c9dc5
+    for unit in units:
+        digest = ((digest ^ unit) * 0x01000193) & 0xffffffff
+    return digest
+
+def normalize_domain(url):
+    """Lowercased host of a URL without a leading www., or '' for URLs without a host"""
+    try:
+        host = urlsplit(url or '').hostname or ''
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+def normalize_url(url):
+    """Key under which URLs of the same page match, or '' for URLs that aren't web pages.
+
+    http and https, a leading www., default ports, a trailing slash, tracking
+    parameters, the order of the other parameters and the fragment don't
+    make a different page. Fragments used as routes (#/ and #!) are kept.
+    """
+    try:
+        parts = urlsplit(url or '')
+        host = parts.hostname or ''
+        port = parts.port
+    except ValueError:
+        return ''
+    if parts.scheme not in ('http', 'https') or not host:
+        return ''
+    if host.startswith('www.'):
+        host = host[4:]
+    if port is not None and port not in (80, 443):
+        host = f"{host}:{port}"
+    query = ''
+    if parts.query:
+        params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if name not in TRACKING_PARAMS and not name.startswith(TRACKING_PREFIXES)]
+        query = urlencode(sorted(params))
+    fragment = parts.fragment if parts.fragment.startswith(('/', '!')) else ''
+    normalized = host + (parts.path.rstrip('/') or '')
+    if query:
+        normalized += '?' + query
+    if fragment:
+        normalized += '#' + fragment
+    return normalized
+
+def _intern_str(value):
+    return sys.intern(value) if type(value) is str else value
+
+def _index_add(index, name, record):
+    records = index.get(name)
+    if records is None:
+        records = index[name] = []
+    records.append(record)
+
+def _index_remove(index, name, record):
+    """Remove a record from a bucket; returns True if the bucket is now gone"""
+    records = index.get(name)
+    if records is not None:
+        try:
+            records.remove(record)
+        except ValueError:
+            pass
+        if not records:
+            del index[name]
+            return True
+    return False
+
+class TabRecord:
+    """One tab in compact form.
+
+    Browser names, domains and favicon URLs are interned and window ids are
+    shared through the store, so thousands of tabs from the same browser and
+    site don't each carry their own copy. Reads use the wire field names
+    (record['browser'], record.get('windowId')) so callers can treat a record
+    like the dict the extension sent; to_dict() builds that dict for clients.
+    """
+
+    __slots__ = ('browser', 'id', 'window_id', 'title', 'url', 'fav_icon_url', 'domain')
+
+    # Wire field name -> slot name
+    FIELDS = {
+        'id': 'id',
+        'title': 'title',
+        'url': 'url',
+        'favIconUrl': 'fav_icon_url',
+        'windowId': 'window_id',
+        'browser': 'browser',
+    }
+
+    def __init__(self, browser, tab_id):
+        self.browser = browser
+        self.id = tab_id
+        self.window_id = None
+        self.title = None
+        self.url = None
+        self.fav_icon_url = None
+        self.domain = ''
+
+    @property
+    def key(self):
+        return tab_key(self.browser, self.id)
+
+    def get(self, field, default=None):
+        if field == 'key':
+            return self.key
+        slot = self.FIELDS.get(field)
+        return default if slot is None else getattr(self, slot)
+
+    def __getitem__(self, field):
+        if field != 'key' and field not in self.FIELDS:
+            raise KeyError(field)
+        return self.get(field)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'url': self.url,
+            'favIconUrl': self.fav_icon_url,
+            'windowId': self.window_id,
+            'browser': self.browser,
+            'key': self.key,
+        }
+
+class TabStore:
+    """All known tabs keyed by (browser, tabId) with secondary indexes.
+
+    Tab ids are only unique inside one browser, so every lookup goes through
+    the (browser, tabId) pair. The window and domain indexes hold lists of
+    records: a list costs a fraction of a set, and removal only searches the
+    tabs of one window or site. The tab-id index holds a single record (or a
+    tuple on the rare id collision across browsers), and the page (normalized
+    URL) index likewise a single record, upgraded to a set only while the page
+    is open in more than one tab - most pages are open just once, and a set
+    per tab would cost more than the tab itself. Favicon URLs are only
+    counted. All are kept in step with every insert, update and removal.
+    Tabs are held as TabRecord objects; callers that need wire dicts use
+    TabRecord.to_dict().
+    """
+
+    def __init__(self):
+        # browser -> {tab id: TabRecord}; browsers stay listed even with no tabs left
+        self._by_browser = {}
+        # (browser, windowId) -> [TabRecord]
+        self._by_window = {}
+        # normalized domain -> [TabRecord]
+        self._by_domain = {}
+        # normalize_url() -> TabRecord, or {TabRecord} for pages open in several tabs, and the keys of those
+        self._by_url = {}
+        self._duplicate_urls = set()
+        # Set whenever a duplicate group forms, changes or goes away; see take_duplicates_changed()
+        self._duplicates_changed = False
+        # favIconUrl -> number of tabs using it; nothing needs the tabs themselves
+        self._icon_tabs = {}
+        # tab id -> TabRecord, or a tuple of them when several browsers use the same id
+        self._by_id = {}
+        # browser -> order-independent sum of tab_digest() over its tabs
+        self._digests = {}
+        # window id -> the one int object shared by every record in that window
+        self._window_ids = {}
+        # browser -> {windowId: id of the window's active tab}
+        self._active = {}
+        # Derived indexes kept elsewhere (e.g. SearchIndex); see add_listener()
+        self._listeners = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add_listener(self, listener):
+        """Have listener.tab_added(record) / tab_removed(record) called as tabs are (re)indexed.
+
+        An updated tab is removed and added again, so listeners only ever see
+        complete records.
+        """
+        self._listeners.append(listener)
+
+    def browsers(self):
+        return list(self._by_browser.keys())
+
+    def has_browser(self, browser):
+        return browser in self._by_browser
+
+    def get(self, browser, tab_id):
+        tabs = self._by_browser.get(browser)
+        return tabs.get(tab_id) if tabs is not None else None
+
+    def find_by_id(self, tab_id):
+        """Tabs with this id in any browser"""
+        found = self._by_id.get(tab_id, ())
+        return list(found) if isinstance(found, tuple) else [found]
+
+    def tabs_for_browser(self, browser):
+        return list(self._by_browser.get(browser, {}).values())
+
+    def tabs_in_window(self, browser, window_id):
+        return list(self._by_window.get((browser, window_id), ()))
+
+    def tabs_for_domain(self, domain):
+        return list(self._by_domain.get(normalize_domain(domain) or domain.lower(), ()))
+
+    def tabs_for_url(self, url):
+        """Open tabs of the same page as url, in any browser"""
+        same_url = self._by_url.get(normalize_url(url))
+        if same_url is None:
+            return []
+        return list(same_url) if isinstance(same_url, set) else [same_url]
+
+    def icon_tab_count(self, fav_icon_url):
+        """How many open tabs use this favicon URL"""
+        return self._icon_tabs.get(fav_icon_url, 0)
+
+    def icon_urls(self):
+        """Every distinct favicon URL in use"""
+        return list(self._icon_tabs)
+
+    def duplicates(self):
+        """[[TabRecord, ...]] for every page open in more than one tab"""
+        return [list(self._by_url[url_key]) for url_key in self._duplicate_urls]
+
+    def duplicate_groups(self):
+        """duplicates() as sorted lists of tab keys, in a stable order"""
+        return sorted(sorted(record.key for record in records) for records in self.duplicates())
+
+    def take_duplicates_changed(self):
+        """Whether duplicate_groups() changed since the last call"""
+        changed = self._duplicates_changed
+        self._duplicates_changed = False
+        return changed
+
+    def all_tabs(self):
+        all_tabs = []
+        for tabs in self._by_browser.values():
+            all_tabs.extend(tabs.values())
+        return all_tabs
+
+    def active_tabs(self, browser):
+        """The active tab of every window of a browser, as {windowId: TabRecord}"""
+        active = {}
+        for window_id, tab_id in self._active.get(browser, {}).items():
+            record = self.get(browser, tab_id)
+            # Closed or moved tabs stay in _active until their window activates another one
+            if record is not None and record.window_id == window_id:
+                active[window_id] = record
+        return active
+
+    def is_active(self, record):
+        return self._active.get(record.browser, {}).get(record.window_id) == record.id
+
+    def set_active(self, browser, tab_id):
+        """Mark a tab as the active one in its window; returns its record, or None if unknown"""
+        record = self.get(browser, tab_id)
+        if record is not None:
+            self._active.setdefault(record.browser, {})[record.window_id] = record.id
+        return record
+
+    def set_active_tabs(self, browser, tab_ids):
+        """Replace the active tab of every window of a browser, e.g. after a full tab list"""
+        self._active.pop(browser, None)
+        for tab_id in tab_ids:
+            self.set_active(browser, tab_id)
+
+    def count(self, browser):
+        return len(self._by_browser.get(browser, {}))
+
+    def digest(self, browser):
+        return self._digests.get(browser, 0)
+
+    def counts(self):
+        return [(browser, len(tabs)) for browser, tabs in self._by_browser.items()]
+
+    def _intern_window(self, window_id):
+        return self._window_ids.setdefault(window_id, window_id)
+
+    def _set_fields(self, record, fields):
+        for field in UPDATABLE_FIELDS:
+            if field not in fields:
+                continue
+            value = fields[field]
+            if field == 'title':
+                record.title = value
+            elif field == 'url':
+                record.url = value
+                record.domain = sys.intern(normalize_domain(value))
+            elif field == 'favIconUrl':
+                record.fav_icon_url = _intern_str(value)
+            elif field == 'windowId':
+                record.window_id = self._intern_window(value)
+
+    def _index(self, record):
+        self._by_browser.setdefault(record.browser, {})[record.id] = record
+        _index_add(self._by_window, (record.browser, record.window_id), record)
+        _index_add(self._by_domain, record.domain, record)
+        if record.fav_icon_url:
+            self._icon_tabs[record.fav_icon_url] = self._icon_tabs.get(record.fav_icon_url, 0) + 1
+        # Computed again on removal rather than kept per record; the URL can't change while indexed
+        url_key = normalize_url(record.url)
+        if url_key:
+            same_url = self._by_url.get(url_key)
+            if same_url is None:
+                self._by_url[url_key] = record
+            else:
+                if not isinstance(same_url, set):
+                    same_url = self._by_url[url_key] = {same_url}
+                same_url.add(record)
+                self._duplicate_urls.add(url_key)
+                self._duplicates_changed = True
+        same_id = self._by_id.get(record.id)
+        if same_id is None:
+            self._by_id[record.id] = record
+        else:
+            self._by_id[record.id] = (same_id if isinstance(same_id, tuple) else (same_id,)) + (record,)
+        self._digests[record.browser] = (self._digests.get(record.browser, 0) + tab_digest(record)) & 0xffffffff
+        self._count += 1
+        for listener in self._listeners:
+            listener.tab_added(record)
+
+    def _unindex(self, record):
+        browser = record.browser
+        del self._by_browser[browser][record.id]
+        if _index_remove(self._by_window, (browser, record.window_id), record):
+            if not any((other, record.window_id) in self._by_window for other in self._by_browser):
+                self._window_ids.pop(record.window_id, None)
+        _index_remove(self._by_domain, record.domain, record)
+        if record.fav_icon_url:
+            if self._icon_tabs[record.fav_icon_url] == 1:
+                del self._icon_tabs[record.fav_icon_url]
+            else:
+                self._icon_tabs[record.fav_icon_url] -= 1
+        url_key = normalize_url(record.url)
+        same_url = self._by_url.get(url_key)
+        if isinstance(same_url, set):
+            self._duplicates_changed = True
+            same_url.discard(record)
+            if len(same_url) == 1:
+                self._by_url[url_key] = same_url.pop()
+                self._duplicate_urls.discard(url_key)
+        elif same_url is record:
+            del self._by_url[url_key]
+        same_id = self._by_id[record.id]
+        if isinstance(same_id, tuple):
+            same_id = tuple(other for other in same_id if other is not record)
+            self._by_id[record.id] = same_id[0] if len(same_id) == 1 else same_id
+        else:
+            del self._by_id[record.id]
+        self._digests[browser] = (self._digests.get(browser, 0) - tab_digest(record)) & 0xffffffff
+        self._count -= 1
+        for listener in self._listeners:
+            listener.tab_removed(record)
+        return record
+
+    def add_browser(self, browser):
+        self._by_browser.setdefault(_intern_str(browser), {})
+
+    def upsert(self, browser, tab):
+        """Insert or refresh one tab from a wire dict; returns (new record or None, changed fields)"""
+        tab_id = tab.get('id')
+        if self.get(browser, tab_id) is not None:
+            return None, self.update(browser, tab_id, tab)
+        record = TabRecord(_intern_str(browser), tab_id)
+        self._set_fields(record, tab)
+        self._index(record)
+        return record, {}
+
+    def remove(self, browser, tab_id):
+        """Remove one tab and return its record, or None if it wasn't known"""
+        record = self.get(browser, tab_id)
+        if record is None:
+            return None
+        return self._unindex(record)
+
+    def update(self, browser, tab_id, fields):
+        """Apply changed fields to one tab; returns the fields that actually changed"""
+        record = self.get(browser, tab_id)
+        if record is None:
+            return {}
+        fields = {field: fields[field] for field in UPDATABLE_FIELDS
+                  if field in fields and record.get(field) != fields[field]}
+        if fields:
+            self._unindex(record)
+            self._set_fields(record, fields)
+            self._index(record)
+        return fields
+
+    def replace_browser(self, browser, tabs):
+        """Replace every tab of one browser; returns (added records, removed keys, changed fields)"""
+        self.add_browser(browser)
+        added, changed = [], []
+        seen = set()
+        for tab in tabs:
+            seen.add(tab.get('id'))
+            record, fields = self.upsert(browser, tab)
+            if record is not None:
+                added.append(record)
+            elif fields:
+                changed.append({"key": tab_key(browser, tab.get('id')), "fields": fields})
+        removed = []
+        for record in [record for tab_id, record in self._by_browser[browser].items() if tab_id not in seen]:
+            removed.append(self._unindex(record).key)
+        return added, removed, changed
@@ -0,0 +1,87 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Most rows one subscription can cover; the popup shows about 30
+VIEWPORT_MAX_ROWS = 200
+
+class Viewport:
+    """One client's window onto an ordered or filtered tab view.
+
+    The client sees rows offset .. offset + limit of a view (one browser or
+    all of them, optionally filtered by a search query) plus the view's total
+    length. update() compares the rows against what was last sent and builds
+    a viewport message with the row keys and only the tabs that are new to the
+    window or changed, so a client that moves its window by a few rows or has
+    one tab renamed gets a few tabs, not the whole window again. Both sides
+    keep exactly the tabs of the current window, so they never disagree about
+    which tabs the client already has.
+    """
+
+    def __init__(self, sub_id=None, browser=None, query='', offset=0, limit=50):
+        self.sub_id = sub_id
+        self.browser = browser
+        self.query = query
+        self.offset = 0
+        self.limit = 1
+        # tab key -> row dict last sent for it
+        self._sent = {}
+        self._keys = None
+        self._total = None
+        self.updates = 0
+        self.move(offset, limit)
+
+    def move(self, offset, limit):
+        self.offset = max(0, int(offset or 0))
+        self.limit = max(1, min(int(limit or 1), VIEWPORT_MAX_ROWS))
+        # Rows at the new offset go out even if they happen to be the same tabs
+        self._keys = None
+
+    def reset(self):
+        """Forget what the client has, e.g. after it lost track; the next update sends every row"""
+        self._sent = {}
+        self._keys = None
+        self._total = None
+
+    def update(self, seq, total, rows):
+        """viewport message bringing the client from the last update to rows, or None if nothing changed"""
+        keys = [row['key'] for row in rows]
+        sent = self._sent
+        tabs = [row for row in rows if sent.get(row['key']) != row]
+        if keys == self._keys and total == self._total and not tabs:
+            return None
+        self._sent = {row['key']: row for row in rows}
+        self._keys = keys
+        self._total = total
+        self.updates += 1
+        return {
+            "type": "viewport",
+            "id": self.sub_id,
+            "seq": seq,
+            "offset": self.offset,
+            "total": total,
+            "keys": keys,
+            "tabs": tabs
+        }
@@ -0,0 +1,159 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unicodedata
+from bisect import bisect_left, insort
+
+def collation_key(text):
+    """Case- and accent-insensitive sort key, close to what localeCompare gives in the popup"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+class TabViews:
+    """Tabs kept sorted per browser, the order clients display them in.
+
+    Within a browser, visited tabs come first by frecency, then the rest by
+    title collation; browsers themselves are grouped by name, which is the
+    "all" view. Each view is a sorted list of precomputed sort keys updated
+    by bisect insertion and removal as the store and the frecency ranking
+    change, so nothing is ever re-sorted as a whole.
+
+    The views also remember which tabs got a new position since the last
+    take_moves(), so patches can tell clients where to put them instead of
+    clients sorting everything again.
+    """
+
+    def __init__(self, store=None, frecency=None):
+        self.frecency = frecency
+        # browser -> sorted [(unvisited, -frecency, collation key, tab key)]
+        self._views = {}
+        # TabRecord -> its entry in the view of its browser
+        self._entries = {}
+        # tab key -> TabRecord, to turn entries back into records
+        self._records = {}
+        # (entry, was moved) of tabs taken out by a store update, to tell whether they really moved
+        self._reindexing = {}
+        # Tabs whose position may have changed since the last take_moves()
+        self._moved = set()
+        if store is not None:
+            for record in store.all_tabs():
+                self.tab_added(record)
+            store.add_listener(self)
+        if frecency is not None:
+            frecency.add_listener(self)
+        self._moved.clear()
+
+    def _entry(self, record):
+        score = self.frecency.score(record.key) if self.frecency is not None else None
+        if score is None:
+            return (True, 0.0, collation_key(record.title), record.key)
+        return (False, -score, collation_key(record.title), record.key)
+
+    def _insert(self, record, entry):
+        self._entries[record] = entry
+        self._records[entry[-1]] = record
+        insort(self._views.setdefault(record.browser, []), entry)
+
+    def _remove(self, record):
+        entry = self._entries.pop(record, None)
+        if entry is None:
+            return None
+        del self._records[entry[-1]]
+        view = self._views[record.browser]
+        view.pop(bisect_left(view, entry))
+        if not view:
+            del self._views[record.browser]
+        return entry
+
+    def tab_added(self, record):
+        entry = self._entry(record)
+        self._insert(record, entry)
+        # A store update removes and re-adds the tab; it only moved if its sort key changed
+        old_entry, was_moved = self._reindexing.pop(record, (None, True))
+        if was_moved or old_entry != entry:
+            self._moved.add(record)
+
+    def tab_removed(self, record):
+        entry = self._remove(record)
+        if entry is not None:
+            self._reindexing[record] = (entry, record in self._moved)
+        self._moved.discard(record)
+
+    def frecency_changed(self, record):
+        if record in self._entries:
+            self._remove(record)
+            self._insert(record, self._entry(record))
+            self._moved.add(record)
+
+    def groups(self):
+        """Browsers that have tabs, in display order"""
+        return sorted(self._views, key=collation_key)
+
+    def ordered(self, browser=None):
+        """Tabs in display order: one browser's view, or every browser grouped ("all")"""
+        browsers = [browser] if browser is not None else self.groups()
+        records = self._records
+        return [records[entry[-1]] for name in browsers for entry in self._views.get(name, ())]
+
+    def count(self, browser=None):
+        if browser is not None:
+            return len(self._views.get(browser, ()))
+        return len(self._entries)
+
+    def window(self, offset, limit, browser=None):
+        """Tabs offset .. offset + limit of ordered(browser), without building the whole list"""
+        records = self._records
+        window = []
+        for name in [browser] if browser is not None else self.groups():
+            view = self._views.get(name, ())
+            if offset >= len(view):
+                offset -= len(view)
+                continue
+            window.extend(records[entry[-1]] for entry in view[offset:offset + limit - len(window)])
+            offset = 0
+            if len(window) >= limit:
+                break
+        return window
+
+    def take_moves(self):
+        """[[tab key, key of the tab before it or None]] for tabs placed since the last call.
+
+        Listed in display order, so a client that first takes all moved tabs
+        out and then inserts them one by one always finds the tab before it.
+        """
+        # Entries kept for the remove/add pair of an update are only needed until the add
+        self._reindexing.clear()
+        positions = []
+        for record in self._moved:
+            entry = self._entries.get(record)
+            if entry is None:
+                continue
+            view = self._views[record.browser]
+            index = bisect_left(view, entry)
+            positions.append((record.browser, index, entry[-1], view[index - 1][-1] if index else None))
+        self._moved.clear()
+        positions.sort(key=lambda position: position[:2])
+        return [[key, after] for _, _, key, after in positions]
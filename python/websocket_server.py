@@ -25,54 +25,230 @@ SOFTWARE.
 """
 
 import asyncio
-import json
+import functools
+import threading
+import time
 import websockets
 import logging
 import psutil
-import ctypes
-from ctypes import wintypes
 from websockets.exceptions import ConnectionClosed
+from activation_routes import ActivationRoutes
+from frecency import ACTIVATE_WEIGHT, FOCUS_WEIGHT, FrecencyIndex
+from tab_search import SearchIndex
+from tab_store import TabStore, tab_key
+from tab_views import TabViews
+from tab_viewports import Viewport
+from client_queue import ClientQueue
+from favicon_prefetch import FaviconPrefetcher
+from favicon_store import get_favicon_store
+from wire_codecs import CODECS, JSON_CODEC, OutgoingMessage, decode_frame, deflate_extension, negotiate_codec
+from window_backends import get_window_backend
 
-# Windows API constants and functions for window management
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
-
-# Windows API constants
-SW_RESTORE = 9
-SW_SHOW = 5
-HWND_TOP = 0
-SWP_SHOWWINDOW = 0x0040
-
-# Define callback function type for EnumWindows
-WNDENUMPROC = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
-
-# Windows API function definitions
-user32.SetForegroundWindow.argtypes = [wintypes.HWND]
-user32.SetForegroundWindow.restype = wintypes.BOOL
-user32.ShowWindow.argtypes = [wintypes.HWND, ctypes.c_int]
-user32.ShowWindow.restype = wintypes.BOOL
-user32.IsIconic.argtypes = [wintypes.HWND]
-user32.IsIconic.restype = wintypes.BOOL
-user32.SetWindowPos.argtypes = [wintypes.HWND, wintypes.HWND, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, wintypes.UINT]
-user32.SetWindowPos.restype = wintypes.BOOL
-user32.IsWindowVisible.argtypes = [wintypes.HWND]
-user32.IsWindowVisible.restype = wintypes.BOOL
-user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, wintypes.LPDWORD]
-user32.GetWindowThreadProcessId.restype = wintypes.DWORD
-user32.EnumWindows.argtypes = [WNDENUMPROC, wintypes.LPARAM]
-user32.EnumWindows.restype = wintypes.BOOL
-user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
-user32.GetWindowTextLengthW.restype = ctypes.c_int
-user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
-user32.GetWindowTextW.restype = ctypes.c_int
-user32.BringWindowToTop.argtypes = [wintypes.HWND]
-user32.BringWindowToTop.restype = wintypes.BOOL
-
-# Cache for browser processes to avoid repeated lookups
-_browser_process_cache = {}
-_cache_timestamp = 0
-
-def bring_browser_to_foreground(browser_name):
+# Seconds icon analyses are collected before they go out together in one patch
+ICON_BATCH_DELAY = 0.05
+
+# Minimum seconds between the EnumWindows passes correlation forces for one browser
+CORRELATE_REFRESH_INTERVAL = 2.0
+
+# Map browser names to window class names and titles
+BROWSER_WINDOW_PATTERNS = {
+    'Chrome': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Google Chrome', 'Chrome']},
+    'Firefox': {'classes': ['MozillaWindowClass'], 'title_contains': ['Mozilla Firefox', 'Firefox']},
+    'Brave': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Brave']},
+    'Opera': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Opera']},
+    'Opera GX': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Opera GX']},
+    'Edge': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Microsoft Edge', 'Edge']},
+}
+
+class WindowRegistry:
+    """Remembers which top-level windows belong to each browser.
+
+    A cached window is checked with IsWindow / IsWindowVisible and its process
+    id (HWNDs get reused), which costs a few microseconds. Only when no cached
+    window of a browser is still valid does the registry run EnumWindows, and
+    that single pass refreshes the candidates of every browser at once. All
+    platform calls go through a WindowBackend, the process-wide one unless a
+    backend is passed in.
+
+    It also learns which native window shows which extension window: a
+    browser titles its window after the active tab, so matching the active
+    tab titles the extension reports against the window titles maps each
+    (browser, windowId) to one HWND, and focusing a tab's window becomes one
+    targeted call instead of guessing among the browser's windows.
+    """
+
+    def __init__(self, patterns=BROWSER_WINDOW_PATTERNS, backend=None,
+                 refresh_interval=CORRELATE_REFRESH_INTERVAL):
+        self.patterns = patterns
+        self._backend = backend
+        self.refresh_interval = refresh_interval
+        # browser -> [(hwnd, pid), ...] in enumeration (z-)order
+        self._windows = {}
+        # (browser, windowId) -> (hwnd, pid) learned by correlate()
+        self._native = {}
+        # (browser, windowId) -> titles that matched no window even right after an enumeration
+        self._unmatched = {}
+        # browser -> perf_counter() of the last enumeration correlate() forced
+        self._forced_refresh = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Focus requests served by a learned mapping vs by the front-most window fallback
+        self.targeted = 0
+        self.untargeted = 0
+        self.enumerations = 0
+        self.lookup_time = 0.0
+        self.enumerate_time = 0.0
+
+    @property
+    def backend(self):
+        return self._backend or get_window_backend()
+
+    def _patterns_for(self, browser_name):
+        return self.patterns.get(browser_name, {'classes': [], 'title_contains': [browser_name]})
+
+    def _matches(self, browser_name, title, window_class):
+        patterns = self._patterns_for(browser_name)
+        if patterns['classes'] and window_class not in patterns['classes']:
+            return False
+        # Additional check: make sure it's a main window (has meaningful title)
+        if len(title.strip()) <= 5:  # Not just "Chrome" but has page title
+            return False
+        title = title.lower()
+        return any(pattern.lower() in title for pattern in patterns['title_contains'])
+
+    def refresh(self, extra_browser=None):
+        """One EnumWindows pass that rebuilds the candidates of every known browser"""
+        browsers = set(self.patterns) | set(self._windows)
+        if extra_browser:
+            browsers.add(extra_browser)
+        found = {browser: [] for browser in browsers}
+
+        start_time = time.perf_counter()
+        for hwnd, title, window_class, pid in self.backend.enumerate_windows():
+            for browser in browsers:
+                if self._matches(browser, title, window_class):
+                    found[browser].append((hwnd, pid))
+        self.enumerate_time += time.perf_counter() - start_time
+        self.enumerations += 1
+        self._windows = found
+        return found
+
+    def candidates(self, browser_name):
+        """Windows of a browser, front-most first; enumerates only if the cache has gone stale"""
+        with self._lock:
+            start_time = time.perf_counter()
+            cached = self._windows.get(browser_name, [])
+            backend = self.backend
+            valid = [(hwnd, pid) for hwnd, pid in cached if backend.is_window_valid(hwnd, pid)]
+            if valid:
+                self.hits += 1
+                if len(valid) != len(cached):
+                    self._windows[browser_name] = valid
+            else:
+                self.misses += 1
+                valid = self.refresh(browser_name).get(browser_name, [])
+            self.lookup_time += time.perf_counter() - start_time
+            return [hwnd for hwnd, _ in valid]
+
+    def correlate(self, browser_name, titles):
+        """Map extension windows to native windows by title; returns how many were mapped.
+
+        titles maps each windowId of the browser to the title(s) its active tab
+        may have. A window is only mapped when exactly one native window title
+        starts with one of them, so two windows showing the same page never
+        get guessed. Windows missing from titles are forgotten.
+
+        A window opened after the cache was filled can't be among the cached
+        ones, so when the extension has more windows than are cached and one
+        of them finds no match, the browser's windows are enumerated again
+        and matched anew. Windows that have no native match of their own
+        (devtools, installed apps, popups) would force that on every call, so
+        a window still unmatched after an enumeration is left alone until its
+        title changes, and forced enumerations are at most one per
+        refresh_interval per browser.
+        """
+        hwnds = self.candidates(browser_name)
+        mapped, unmatched = self._correlate(browser_name, titles, hwnds)
+        with self._lock:
+            for key in [key for key in self._unmatched if key[0] == browser_name and key[1] not in unmatched]:
+                del self._unmatched[key]
+            new = [window_id for window_id in unmatched
+                   if self._unmatched.get((browser_name, window_id)) != tuple(titles[window_id])]
+            now = time.perf_counter()
+            last = self._forced_refresh.get(browser_name)
+            if not (new and len(titles) > len(hwnds) and (last is None or now - last >= self.refresh_interval)):
+                return mapped
+            # A window opened after the cache was filled isn't a candidate yet, however valid the cached ones are
+            self._forced_refresh[browser_name] = now
+            self.misses += 1
+            hwnds = [hwnd for hwnd, _ in self.refresh(browser_name).get(browser_name, [])]
+        mapped, unmatched = self._correlate(browser_name, titles, hwnds)
+        with self._lock:
+            for window_id in unmatched:
+                self._unmatched[(browser_name, window_id)] = tuple(titles[window_id])
+        return mapped
+
+    def _correlate(self, browser_name, titles, hwnds):
+        """One matching pass over hwnds; returns (windows mapped, windowIds with a title but no unique match)"""
+        backend = self.backend
+        window_titles = [(hwnd, backend.window_title(hwnd)) for hwnd in hwnds]
+        mapped = 0
+        unmatched = []
+        with self._lock:
+            pids = dict(self._windows.get(browser_name, []))
+            for key in [key for key in self._native if key[0] == browser_name and key[1] not in titles]:
+                del self._native[key]
+            for window_id, expected in titles.items():
+                expected = [title for title in expected if title]
+                matches = [hwnd for hwnd, title in window_titles
+                           if any(title.startswith(prefix) for prefix in expected)]
+                if len(matches) != 1 or matches[0] not in pids:
+                    if expected:
+                        unmatched.append(window_id)
+                    continue
+                hwnd = matches[0]
+                # One native window shows exactly one extension window
+                for key in [key for key, (other, _) in self._native.items() if other == hwnd]:
+                    del self._native[key]
+                self._native[(browser_name, window_id)] = (hwnd, pids[hwnd])
+                mapped += 1
+        return mapped, unmatched
+
+    def window_for(self, browser_name, window_id):
+        """The native window learned for an extension window, or None if unknown or gone"""
+        key = (browser_name, window_id)
+        with self._lock:
+            native = self._native.get(key)
+        if native is not None and self.backend.is_window_valid(*native):
+            return native[0]
+        with self._lock:
+            self._native.pop(key, None)
+        return None
+
+    def invalidate(self, browser_name=None):
+        with self._lock:
+            if browser_name is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(browser_name, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "enumerations": self.enumerations,
+            "mapped_windows": len(self._native),
+            "targeted": self.targeted,
+            "untargeted": self.untargeted,
+            "avg_lookup_ms": round(self.lookup_time / lookups * 1000, 3) if lookups else 0,
+            "avg_enumerate_ms": round(self.enumerate_time / self.enumerations * 1000, 3) if self.enumerations else 0,
+        }
+
+window_registry = WindowRegistry()
+
+def bring_browser_to_foreground(browser_name, window_id=None, titles=None):
     """Ultra-fast browser focusing - bypasses slow process enumeration"""
     try:
         import time
@@ -80,7 +256,7 @@ def bring_browser_to_foreground(browser_name):
         print(f"[PERF] Starting ULTRA-FAST browser focus for {browser_name}")
         
         # Skip process enumeration entirely - directly find browser windows
-        success = _find_and_focus_browser_window_direct(browser_name)
+        success = _find_and_focus_browser_window_direct(browser_name, window_id, titles)
         
         total_time = time.time() - start_time
         if success:
@@ -94,68 +270,42 @@ def bring_browser_to_foreground(browser_name):
         print(f"[PERF] ULTRA-FAST ERROR after {total_time:.3f}s: {e}")
         return False
 
-def _find_and_focus_browser_window_direct(browser_name):
-    """Find browser window directly without process enumeration"""
+def _find_and_focus_browser_window_direct(browser_name, window_id=None, titles=None):
+    """Focus the native window of window_id, or the browser's front-most window if it's unknown.
+
+    titles ({windowId: active tab titles}) lets a missing or stale mapping be
+    learned again on the spot before falling back.
+    """
     try:
         import time
         start_time = time.time()
         
-        # Map browser names to window class names and titles
-        browser_patterns = {
-            'Chrome': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Google Chrome', 'Chrome']},
-            'Firefox': {'classes': ['MozillaWindowClass'], 'title_contains': ['Mozilla Firefox', 'Firefox']},
-            'Brave': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Brave']},
-            'Opera': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Opera']},
-            'Opera GX': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Opera GX']},
-            'Edge': {'classes': ['Chrome_WidgetWin_1'], 'title_contains': ['Microsoft Edge', 'Edge']},
-        }
-        
-        patterns = browser_patterns.get(browser_name, {'classes': [], 'title_contains': [browser_name]})
-        
-        # Find browser window directly
+        lookup_start = time.time()
         browser_window = None
+        if window_id is not None:
+            browser_window = window_registry.window_for(browser_name, window_id)
+            if browser_window is None and titles:
+                window_registry.correlate(browser_name, titles)
+                browser_window = window_registry.window_for(browser_name, window_id)
+        if browser_window is None:
+            window_registry.untargeted += 1
+            # Cached candidates; a full window enumeration only happens if they went stale
+            candidates = window_registry.candidates(browser_name)
+            browser_window = candidates[0] if candidates else None
+        else:
+            window_registry.targeted += 1
+            print(f"[PERF] Targeted window {browser_window} for {browser_name} window {window_id}")
+        lookup_time = time.time() - lookup_start
+        print(f"[PERF] Window lookup took {lookup_time:.3f}s")
         
-        def enum_windows_callback(hwnd, lParam):
-            nonlocal browser_window
-            if not user32.IsWindowVisible(hwnd):
-                return True
-                
-            # Get window title
-            title_length = user32.GetWindowTextLengthW(hwnd)
-            if title_length == 0:
-                return True
-                
-            title_buffer = ctypes.create_unicode_buffer(title_length + 1)
-            user32.GetWindowTextW(hwnd, title_buffer, title_length + 1)
-            window_title = title_buffer.value
-            
-            # Check if this looks like a browser window
-            for title_pattern in patterns['title_contains']:
-                if title_pattern.lower() in window_title.lower():
-                    # Additional check: make sure it's a main window (has meaningful title)
-                    if len(window_title.strip()) > 5:  # Not just "Chrome" but has page title
-                        browser_window = hwnd
-                        return False  # Stop enumeration
-            
-            return True
-        
-        enum_start = time.time()
-        user32.EnumWindows(WNDENUMPROC(enum_windows_callback), 0)
-        enum_time = time.time() - enum_start
-        print(f"[PERF] Direct window search took {enum_time:.3f}s")
-        
-        if browser_window:
+        if browser_window is not None:
             focus_start = time.time()
             # Ultra-fast focusing
-            if user32.IsIconic(browser_window):
-                user32.ShowWindow(browser_window, SW_RESTORE)
-            
-            user32.SetForegroundWindow(browser_window)
-            user32.BringWindowToTop(browser_window)
+            window_registry.backend.focus_window(browser_window)
             
             focus_time = time.time() - focus_start
             total_time = time.time() - start_time
-            print(f"[PERF] Direct focus: search={enum_time:.3f}s, focus={focus_time:.3f}s, total={total_time:.3f}s")
+            print(f"[PERF] Direct focus: lookup={lookup_time:.3f}s, focus={focus_time:.3f}s, total={total_time:.3f}s")
             return True
         
         total_time = time.time() - start_time
@@ -166,59 +316,139 @@ def _find_and_focus_browser_window_direct(browser_name):
         print(f"[PERF] Error in direct window search: {e}")
         return False
 
-def _focus_browser_window_fast(pid):
-    """Fast window focusing for a specific PID"""
-    try:
-        import time
-        start_time = time.time()
-        print(f"[PERF] Focusing window for PID {pid}")
-        
-        # Use a more efficient approach - find the main window directly
-        main_window = None
-        
-        def enum_windows_callback(hwnd, lParam):
-            nonlocal main_window
-            if user32.IsWindowVisible(hwnd):
-                window_pid = wintypes.DWORD()
-                user32.GetWindowThreadProcessId(hwnd, ctypes.byref(window_pid))
-                if window_pid.value == pid:
-                    # Check if this is likely the main browser window
-                    window_text_length = user32.GetWindowTextLengthW(hwnd)
-                    if window_text_length > 0:  # Has a title, likely main window
-                        main_window = hwnd
-                        return False  # Stop enumeration
-            return True
-        
-        enum_start = time.time()
-        user32.EnumWindows(WNDENUMPROC(enum_windows_callback), 0)
-        enum_time = time.time() - enum_start
-        print(f"[PERF] Window enumeration took {enum_time:.3f}s")
-        
-        if main_window:
-            focus_start = time.time()
-            # Fast window activation sequence
-            if user32.IsIconic(main_window):
-                user32.ShowWindow(main_window, SW_RESTORE)
-            
-            # Use the most direct approach for instant focusing
-            user32.SetForegroundWindow(main_window)
-            user32.BringWindowToTop(main_window)
-            focus_time = time.time() - focus_start
-            total_time = time.time() - start_time
-            print(f"[PERF] Window focus: enum={enum_time:.3f}s, focus={focus_time:.3f}s, total={total_time:.3f}s")
-            return True
-        
-        total_time = time.time() - start_time
-        print(f"[PERF] No main window found after {total_time:.3f}s")
-        return False
-    except Exception as e:
-        print(f"Error in fast window focus: {e}")
-        return False
+class FocusWorker:
+    """Runs browser window focusing on its own thread.
+
+    EnumWindows and friends can take tens of milliseconds, so they must never
+    run on the websocket event loop. Requests are coalesced: only the newest
+    pending one is kept, so a burst of clicks focuses the last browser chosen
+    instead of replaying every intermediate one. Window correlation runs here
+    too, after any pending focus and only the newest titles per browser.
+    """
+
+    def __init__(self, focus=None):
+        self._focus = focus or bring_browser_to_foreground
+        self._cond = threading.Condition()
+        # (browser, windowId, titles) of the newest focus request
+        self._pending = None
+        # browser -> newest {windowId: titles} waiting to be correlated
+        self._correlations = {}
+        self._stopped = False
+        self._thread = None
+        self.requested = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.correlated = 0
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='FocusWorker', daemon=True)
+            self._thread.start()
+
+    def request(self, browser_name, window_id=None, titles=None):
+        """Queue a focus request and return immediately"""
+        with self._cond:
+            self._start()
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (browser_name, window_id, titles)
+            self.requested += 1
+            self._cond.notify()
+
+    def correlate(self, browser_name, titles):
+        """Queue learning the native windows of a browser from its active tab titles"""
+        with self._cond:
+            self._start()
+            self._correlations[browser_name] = titles
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "completed": self.completed,
+            "coalesced": self.coalesced,
+            "correlated": self.correlated,
+            "pending": self._pending[0] if self._pending else None,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._correlations and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                if self._pending is not None:
+                    pending, self._pending = self._pending, None
+                    correlation = None
+                else:
+                    pending = None
+                    correlation = self._correlations.popitem()
+            if pending is not None:
+                browser_name, window_id, titles = pending
+                try:
+                    self._focus(browser_name, window_id, titles)
+                except Exception as e:
+                    print(f"[PERF] Focus worker error for {browser_name}: {e}")
+                self.completed += 1
+            else:
+                browser_name, titles = correlation
+                try:
+                    mapped = window_registry.correlate(browser_name, titles)
+                    print(f"[PERF] Correlated {mapped}/{len(titles)} {browser_name} windows")
+                except Exception as e:
+                    print(f"[PERF] Window correlation error for {browser_name}: {e}")
+                self.correlated += 1
 
 class TabWebSocketServer:
-    def __init__(self):
-        self.clients = set()
-        self.browser_tabs = {}
+    def __init__(self, max_queue=64, send_timeout=5.0):
+        # websocket -> ClientQueue that owns all sends to that client
+        self.clients = {}
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        # Totals kept across connections for queue_stats()
+        self.slow_disconnects = 0
+        self.dropped_total = 0
+        # Every known tab, indexed by (browser, tabId), window, domain and browser
+        self.store = TabStore()
+        # Decayed visit score per tab, kept in rank order; also breaks ties in search
+        self.frecency = FrecencyIndex()
+        # Trigram search over titles and URLs, kept in step with the store
+        self.search_index = SearchIndex(self.store, self.frecency)
+        # Tabs sorted per browser and grouped, in the order clients show them
+        self.views = TabViews(self.store, self.frecency)
+        # websocket -> Viewport for clients that only follow a window of a view instead of every tab
+        self.viewports = {}
+        # Filtered views shared by viewports with the same query, per state seq
+        self._viewport_searches = {}
+        self._viewport_searches_seq = None
+        # Duplicate groups as last sent in a patch
+        self._duplicates = []
+        # Favicon bytes and their analysis (white / dominant colour), attached by start_server()
+        self.favicon_store = None
+        self.loop = None
+        # Downloads the icons of newly seen tabs before a popup asks for them; also attached by start_server()
+        self.prefetcher = None
+        # Icon analyses waiting for flush_icons()
+        self._pending_icons = {}
+        # Win32 focusing happens on this thread, never on the event loop
+        self.focus_worker = FocusWorker()
+        # websocket -> {'browser': name, 'seq': last applied ingest seq} for extensions using event ingest
+        self.ingest_state = {}
+        # browser -> the extension connection that sends its tabs; activations go only there
+        self.browser_connections = {}
+        # Click-to-ack latency of activate_tab per browser
+        self.activations = ActivationRoutes()
+        # Monotonic state sequence number, bumped for every patch sent to clients
+        self.seq = 0
+        # Encoded tabs_update frames per codec name and the seq they were built for
+        self._snapshot_frames = {}
+        self._snapshot_seq = None
         # Configure logging
         logging.basicConfig(level=logging.WARNING)
         self.logger = logging.getLogger('WebSocketServer')
@@ -226,64 +456,291 @@ class TabWebSocketServer:
         logging.getLogger('websockets.server').setLevel(logging.ERROR)
 
     async def register(self, websocket):
-        self.clients.add(websocket)
+        queue = ClientQueue(websocket, self.snapshot_frame, self.max_queue, self.send_timeout,
+                            viewport_frame=functools.partial(self.viewport_frame, websocket))
+        self.clients[websocket] = queue
+        queue.start()
         print(f"Client connected. Total clients: {len(self.clients)}")
         self.logger.info(f"Client connected. Total clients: {len(self.clients)}")
         await self.send_all_tabs(websocket)
 
     async def unregister(self, websocket):
-        self.clients.remove(websocket)
+        queue = self.clients.pop(websocket)
+        queue.stop()
+        self.dropped_total += queue.dropped
+        if queue.slow:
+            self.slow_disconnects += 1
+        self.ingest_state.pop(websocket, None)
+        self.viewports.pop(websocket, None)
+        for browser in [browser for browser, owner in self.browser_connections.items() if owner is websocket]:
+            del self.browser_connections[browser]
+        self.activations.forget_requester(websocket)
         self.logger.info(f"Client disconnected. Total clients: {len(self.clients)}")
 
+    def send(self, websocket, message):
+        """Queue a message for one client; never waits on the client"""
+        queue = self.clients.get(websocket)
+        if queue is not None:
+            queue.put(OutgoingMessage(message))
+
+    def send_snapshot(self, websocket):
+        """Queue the latest snapshot for one client, replacing any patches it hasn't received yet"""
+        queue = self.clients.get(websocket)
+        if queue is None:
+            return
+        viewport = self.viewports.get(websocket)
+        if viewport is not None:
+            # Viewport clients only hold their window; send all of it again
+            viewport.reset()
+            queue.put_viewport()
+        else:
+            queue.put_snapshot()
+
+    def queue_stats(self):
+        """Send queue depth and drop counters per client plus running totals"""
+        clients = [queue.stats() for queue in self.clients.values()]
+        return {
+            "clients": clients,
+            "total_depth": sum(client["depth"] for client in clients),
+            "dropped": self.dropped_total + sum(client["dropped"] for client in clients),
+            "slow_disconnects": self.slow_disconnects + sum(1 for client in clients if client["slow"]),
+        }
+
+    def build_snapshot(self):
+        """Full state message: every tab from every browser plus the current seq.
+
+        Tabs come in display order from the server-side views: grouped by
+        browser (see groups), most frecent first, then by title. Patches keep
+        that order with moves, so clients never sort.
+        """
+        return {
+            "type": "tabs_update",
+            "seq": self.seq,
+            "tabs": [record.to_dict() for record in self.views.ordered()],
+            "groups": self.views.groups(),
+            "frecency": self.frecency.scores(),
+            # Tab keys of every page that is open more than once
+            "duplicates": self.store.duplicate_groups(),
+            # favIconUrl -> {"white", "color"} for the icons analyzed so far
+            "icons": self.icon_analyses(),
+            "browsers": self.store.browsers()  # This will now include both Opera and Opera GX
+        }
+
+    def snapshot_frame(self, codec=JSON_CODEC):
+        """Encoded tabs_update for the current seq, serialized at most once per state version and codec"""
+        if self._snapshot_seq != self.seq:
+            self._snapshot_frames = {}
+            self._snapshot_seq = self.seq
+        frame = self._snapshot_frames.get(codec.name)
+        if frame is None:
+            frame = self._snapshot_frames[codec.name] = codec.encode(self.build_snapshot())
+        return frame
+
+    def icon_analyses(self):
+        """{favIconUrl: analysis} for every icon in use that has been analyzed"""
+        if self.favicon_store is None:
+            return {}
+        analyses = {}
+        for url in self.store.icon_urls():
+            analysis = self.favicon_store.analysis(url)
+            if analysis is not None:
+                analyses[url] = analysis
+        return analyses
+
+    def icon_analyzed(self, url, analysis):
+        """FaviconStore listener; runs on an analysis thread, so hand over to the event loop"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.queue_icon, url, analysis)
+
+    def queue_icon(self, url, analysis):
+        # A popup opening asks for dozens of icons at once; send their analyses in one patch
+        if not self._pending_icons:
+            self.loop.call_later(ICON_BATCH_DELAY, self.flush_icons)
+        self._pending_icons[url] = analysis
+
+    def flush_icons(self):
+        icons = {url: analysis for url, analysis in self._pending_icons.items() if self.store.icon_tab_count(url)}
+        self._pending_icons = {}
+        self.broadcast_patch(self.make_patch(icons=icons))
+
+    def row_dict(self, record):
+        """A tab as a viewport row: its wire dict plus its icon analysis once known"""
+        row = record.to_dict()
+        if self.favicon_store is not None and record.fav_icon_url:
+            analysis = self.favicon_store.analysis(record.fav_icon_url)
+            if analysis is not None:
+                row["icon"] = analysis
+        return row
+
+    def viewport_rows(self, viewport):
+        """(total, row dicts) of a viewport's window onto its view"""
+        if not viewport.query:
+            records = self.views.window(viewport.offset, viewport.limit, viewport.browser)
+            return self.views.count(viewport.browser), [self.row_dict(record) for record in records]
+        # A filtered view is every search match, ranked best first; only the window's rows get highlight spans
+        if self._viewport_searches_seq != self.seq:
+            self._viewport_searches = {}
+            self._viewport_searches_seq = self.seq
+        search_key = (viewport.query, viewport.browser)
+        results = self._viewport_searches.get(search_key)
+        if results is None:
+            results = self._viewport_searches[search_key] = self.search_index.search_all(
+                viewport.query, viewport.browser)
+        rows = [dict(self.row_dict(record), titleSpans=title_spans)
+                for _, record, title_spans, _ in results[viewport.offset:viewport.offset + viewport.limit]]
+        return len(results), rows
+
+    def viewport_frame(self, websocket, codec=JSON_CODEC):
+        """Encoded viewport update for one client, built from the current state, or None if nothing changed"""
+        viewport = self.viewports.get(websocket)
+        if viewport is None:
+            return None
+        total, rows = self.viewport_rows(viewport)
+        message = viewport.update(self.seq, total, rows)
+        return codec.encode(message) if message is not None else None
+
     async def send_all_tabs(self, websocket):
-        print(f"Sending all tabs to client. Browser tabs available: {list(self.browser_tabs.keys())}")
-        if self.browser_tabs:
-            # Combine all tabs from all browsers while preserving their browser type
-            all_tabs = []
-            for browser_type, tabs in self.browser_tabs.items():
-                # Ensure each tab has the correct browser type
-                for tab in tabs:
-                    tab['browser'] = browser_type
-                all_tabs.extend(tabs)
-            
-            print(f"Sending {len(all_tabs)} tabs to client")
-            await websocket.send(json.dumps({
-                "type": "tabs_update",
-                "tabs": all_tabs,
-                "browsers": list(self.browser_tabs.keys())  # This will now include both Opera and Opera GX
-            }))
+        print(f"Sending all tabs to client. Browser tabs available: {self.store.browsers()}")
+        if self.store.browsers():
+            print(f"Sending {len(self.store)} tabs to client (seq {self.seq})")
+            self.send_snapshot(websocket)
         else:
             print("No browser tabs available to send")
 
+    def make_patch(self, added=(), removed=(), changed=(), force=False, frecency=None, icons=None):
+        """Bump the state seq and build a tabs_patch, or return None if nothing changed"""
+        # [tab key, key of the tab before it] for every tab that got a new place in its view
+        moves = self.views.take_moves()
+        if not (added or removed or changed or frecency or icons or moves or force):
+            return None
+        for key in removed:
+            self.frecency.forget(key)
+        self.seq += 1
+        patch = {
+            "type": "tabs_patch",
+            "seq": self.seq,
+            "added": [record.to_dict() for record in added],
+            "removed": list(removed),
+            "changed": list(changed),
+            "moves": moves,
+            "groups": self.views.groups(),
+            "browsers": self.store.browsers()
+        }
+        if frecency:
+            patch["frecency"] = frecency
+        if self.favicon_store is not None:
+            # Icons of new or re-iconed tabs that were analyzed before, e.g. for another tab
+            icons = dict(icons or {})
+            new_urls = {record.fav_icon_url for record in added}
+            new_urls.update(change["fields"].get("favIconUrl") for change in changed)
+            for url in new_urls:
+                analysis = self.favicon_store.analysis(url) if url else None
+                if analysis is not None:
+                    icons[url] = analysis
+        if icons:
+            patch["icons"] = icons
+        if self.store.take_duplicates_changed():
+            duplicates = self.store.duplicate_groups()
+            if duplicates != self._duplicates:
+                patch["duplicates"] = self._duplicates = duplicates
+        return patch
+
+    def record_visit(self, record, weight):
+        """Count a visit towards a tab's frecency and return the patch carrying its new score"""
+        score = self.frecency.visit(record, weight)
+        return self.make_patch(frecency={record.key: round(score, 4)})
+
     def update_tab_state(self, tabs, browser):
-        # Store tabs directly as a list
-        self.browser_tabs[browser] = tabs
-
-    async def broadcast_current_state(self):
-        # Combine all tabs from all browsers while preserving their browser type
-        all_tabs = []
-        for browser_type, tabs in self.browser_tabs.items():
-            # Ensure each tab has the correct browser type
-            for tab in tabs:
-                tab['browser'] = browser_type
-            all_tabs.extend(tabs)
+        """Replace the tabs of one browser and return the patch against the previous state"""
+        is_new_browser = not self.store.has_browser(browser)
+        added, removed, changed = self.store.replace_browser(browser, tabs)
+        return self.make_patch(added, removed, changed, force=is_new_browser)
 
-        message = json.dumps({
-            "type": "tabs_update",
-            "tabs": all_tabs,
-            "browsers": list(self.browser_tabs.keys())  # This will now include both Opera and Opera GX
-        })
+    def apply_tab_event(self, browser, data):
+        """Apply one tab_created/tab_removed/tab_updated/tab_activated event and return the resulting patch"""
+        event_type = data["type"]
+        if event_type == "tab_created":
+            is_new_browser = not self.store.has_browser(browser)
+            added, fields = self.store.upsert(browser, data["tab"])
+            if added is not None:
+                return self.make_patch(added=[added], force=is_new_browser)
+            key = tab_key(browser, data["tab"].get("id"))
+            return self.make_patch(changed=[{"key": key, "fields": fields}] if fields else ())
 
-        # Send to all clients
-        for client in self.clients:
-            try:
-                await client.send(message)
-            except websockets.ConnectionClosed:
-                pass
+        if event_type == "tab_removed":
+            record = self.store.remove(browser, data.get("tabId"))
+            return self.make_patch(removed=[record.key]) if record else None
+
+        if event_type == "tab_updated":
+            fields = self.store.update(browser, data.get("tabId"), data.get("fields", {}))
+            key = tab_key(browser, data.get("tabId"))
+            return self.make_patch(changed=[{"key": key, "fields": fields}]) if fields else None
+
+        if event_type == "tab_activated":
+            # Clients don't show the active tab; it feeds window correlation and frecency
+            record = self.store.set_active(browser, data.get("tabId"))
+            return self.record_visit(record, FOCUS_WEIGHT) if record else None
+
+        return None
+
+    def changes_window_title(self, browser, data):
+        """Whether an ingest event changes what one of the browser's windows is titled"""
+        if data["type"] == "tab_activated":
+            return True
+        if data["type"] == "tab_updated" and "title" in data.get("fields", {}):
+            record = self.store.get(browser, data.get("tabId"))
+            return record is not None and self.store.is_active(record)
+        return False
+
+    def active_window_titles(self, browser, target=None):
+        """{windowId: titles} for window correlation, from each window's active tab.
+
+        A target tab that is about to be activated is accepted too, since its
+        window may already be titled after it by the time the focus runs.
+        """
+        titles = {window_id: (record.title,) for window_id, record in self.store.active_tabs(browser).items()}
+        if target is not None:
+            titles[target.window_id] = titles.get(target.window_id, ()) + (target.title,)
+        return titles
+
+    def learn_windows(self, browser):
+        titles = self.active_window_titles(browser)
+        if titles:
+            self.focus_worker.correlate(browser, titles)
+
+    def request_tabs_resync(self, websocket, reason):
+        """Ask an extension for a full tabs_update and ignore its events until it arrives"""
+        state = self.ingest_state.get(websocket)
+        if state is not None:
+            if state.get('resync_pending'):
+                return
+            state['resync_pending'] = True
+        print(f"Requesting full tab resync from extension: {reason}")
+        self.send(websocket, {"type": "resync_tabs"})
+
+    def broadcast_patch(self, patch):
+        if patch:
+            print(f"Broadcasting patch seq {patch['seq']}: "
+                  f"+{len(patch['added'])} -{len(patch['removed'])} ~{len(patch['changed'])}")
+            message = OutgoingMessage(patch)
+            for websocket, queue in self.clients.items():
+                # Viewport clients get their window re-checked instead; most patches don't touch it
+                if websocket in self.viewports:
+                    queue.put_viewport()
+                else:
+                    queue.put_patch(message)
 
     async def handle_message(self, websocket, message):
-        data = json.loads(message)
-        if data["type"] == "tabs_update":
+        queue = self.clients.get(websocket)
+        data = decode_frame(message, queue.pending_codec if queue else JSON_CODEC)
+        if data["type"] == "hello":
+            # Codec negotiation: the reply goes out in the old codec, everything after it in the new one
+            codec = negotiate_codec(data.get("codecs"))
+            print(f"Client negotiated codec {codec.name} (offered {data.get('codecs')})")
+            self.send(websocket, {"type": "hello", "codec": codec.name, "codecs": list(CODECS)})
+            if queue is not None:
+                queue.switch_codec(codec)
+        elif data["type"] == "tabs_update":
             tabs = data["tabs"]
             browser = data["browser"]
             
@@ -305,44 +762,166 @@ class TabWebSocketServer:
                     elif 'opera-extension://' in tab.get('url', ''):
                         tab['browser'] = browser
             
-            # Store tabs under their specific browser
-            if browser not in self.browser_tabs:
-                self.browser_tabs[browser] = []
+            self.browser_connections[browser] = websocket
             
-            # Update the tabs for this specific browser
-            self.browser_tabs[browser] = tabs
+            # Extensions that stream tab events number their messages; older ones just resend everything
+            if "seq" in data:
+                self.ingest_state[websocket] = {'browser': browser, 'seq': data["seq"]}
             
-            print(f"Current browsers in storage: {list(self.browser_tabs.keys())}")  # Debug print
-            print(f"Tabs per browser: {[(b, len(t)) for b, t in self.browser_tabs.items()]}")  # Debug print
+            # Update the tabs for this specific browser and only send what changed
+            patch = self.update_tab_state(tabs, browser)
+            if "activeTabs" in data:
+                self.store.set_active_tabs(browser, data["activeTabs"])
+                self.learn_windows(browser)
             
-            # Broadcast updated state
-            await self.broadcast_current_state()
+            print(f"Current browsers in storage: {self.store.browsers()}")  # Debug print
+            print(f"Tabs per browser: {self.store.counts()}")  # Debug print
+            
+            self.broadcast_patch(patch)
+        elif data["type"] in ("tab_created", "tab_removed", "tab_updated", "tab_activated"):
+            state = self.ingest_state.get(websocket)
+            if state is None or state.get('resync_pending'):
+                self.request_tabs_resync(websocket, "event before full tab list")
+                return
+            if data.get("seq") != state['seq'] + 1:
+                self.request_tabs_resync(websocket, f"expected seq {state['seq'] + 1}, got {data.get('seq')}")
+                return
+            state['seq'] = data["seq"]
+            self.broadcast_patch(self.apply_tab_event(state['browser'], data))
+            if self.changes_window_title(state['browser'], data):
+                self.learn_windows(state['browser'])
+        elif data["type"] == "tabs_digest":
+            state = self.ingest_state.get(websocket)
+            if state is None or state.get('resync_pending'):
+                return
+            browser = state['browser']
+            if (data.get("seq") != state['seq']
+                    or data.get("count") != self.store.count(browser)
+                    or data.get("digest") != self.store.digest(browser)):
+                self.request_tabs_resync(websocket, f"digest mismatch for {browser}")
+        elif data["type"] == "resync":
+            # Client detected a gap in the patch sequence - send it a fresh snapshot
+            print(f"Client requested resync (client seq {data.get('seq')}, server seq {self.seq})")
+            self.send_snapshot(websocket)
+        elif data["type"] == "query":
+            # Look tabs up through the store indexes instead of scanning every browser
+            if data.get("duplicates"):
+                groups = self.store.duplicates()
+                self.send(websocket, {
+                    "type": "query_result",
+                    "id": data.get("id"),
+                    "seq": self.seq,
+                    "groups": [[record.key for record in records] for records in groups],
+                    "tabs": [record.to_dict() for records in groups for record in records]
+                })
+                return
+            if "url" in data:
+                tabs = self.store.tabs_for_url(data["url"])
+            elif "windowId" in data:
+                tabs = self.store.tabs_in_window(data.get("browser"), data["windowId"])
+            elif "domain" in data:
+                tabs = self.store.tabs_for_domain(data["domain"])
+                if data.get("browser"):
+                    tabs = [tab for tab in tabs if tab['browser'] == data["browser"]]
+            elif "browser" in data:
+                tabs = self.store.tabs_for_browser(data["browser"])
+            else:
+                tabs = self.store.all_tabs()
+            self.send(websocket, {
+                "type": "query_result",
+                "id": data.get("id"),
+                "seq": self.seq,
+                "tabs": [record.to_dict() for record in tabs]
+            })
+        elif data["type"] == "search":
+            # Ranked top-k search so clients only render results
+            start_time = time.perf_counter()
+            limit = max(1, min(int(data.get("limit") or 20), 200))
+            results = self.search_index.search(data.get("query", ""), limit, data.get("browser"))
+            took_ms = (time.perf_counter() - start_time) * 1000
+            self.send(websocket, {
+                "type": "search_result",
+                "id": data.get("id"),
+                "query": data.get("query", ""),
+                "seq": self.seq,
+                "tookMs": round(took_ms, 3),
+                "results": [
+                    {"tab": record.to_dict(), "score": round(score, 2), "titleSpans": title_spans, "urlSpans": url_spans}
+                    for score, record, title_spans, url_spans in results
+                ]
+            })
+        elif data["type"] == "subscribe":
+            # Follow rows offset .. offset + limit of a view instead of every tab; sent again to scroll
+            query = (data.get("query") or "").strip()
+            viewport = self.viewports.get(websocket)
+            if (viewport is None or viewport.sub_id != data.get("id")
+                    or viewport.query != query or viewport.browser != data.get("browser")):
+                viewport = self.viewports[websocket] = Viewport(
+                    data.get("id"), data.get("browser"), query, data.get("offset"), data.get("limit"))
+            else:
+                viewport.move(data.get("offset"), data.get("limit"))
+            if queue is not None:
+                queue.put_viewport()
+        elif data["type"] == "unsubscribe":
+            # Back to the full tab list
+            if self.viewports.pop(websocket, None) is not None:
+                self.send_snapshot(websocket)
         elif data["type"] == "activate_tab":
+            start_time = time.perf_counter()
             # Find which browser this tab belongs to
             tab_id = data.get("tabId")
-            target_browser = None
+            if data.get("browser"):
+                tab = self.store.get(data["browser"], tab_id)
+            else:
+                # Older clients only send the tab id, which can exist in several browsers
+                candidates = self.store.find_by_id(tab_id)
+                matching_window = [t for t in candidates if t.get('windowId') == data.get("windowId")]
+                tab = (matching_window or candidates or [None])[0]
+            target_browser = tab['browser'] if tab else None
             
-            # Search through all browsers to find the tab
-            for browser_name, tabs in self.browser_tabs.items():
-                for tab in tabs:
-                    if tab.get('id') == tab_id:
-                        target_browser = browser_name
-                        break
-                if target_browser:
-                    break
+            # Relay only to the extension that owns the tab - the same id in another
+            # browser is a different tab. It goes out first, so the browser switches
+            # tabs while the OS-level focus runs on the focus worker
+            owner_queue = self.clients.get(self.browser_connections.get(target_browser))
+            if owner_queue is not None:
+                request_id = self.activations.start(target_browser, websocket, start_time)
+                owner_queue.put(OutgoingMessage(dict(data, browser=target_browser, requestId=request_id)))
+            else:
+                print(f"No extension connected for {target_browser} tab {tab_id}; activation not relayed")
             
-            # Bring the browser to foreground
+            # Bring the tab's own window to the foreground, not just any window of its browser
             if target_browser:
                 print(f"Bringing {target_browser} to foreground for tab {tab_id}")
-                bring_browser_to_foreground(target_browser)
-            
-            # Broadcast tab activation request to all clients
-            for client in self.clients:
-                if client != websocket:  # Don't send back to sender
-                    try:
-                        await client.send(message)
-                    except websockets.ConnectionClosed:
-                        pass
+                self.focus_worker.request(target_browser, tab['windowId'],
+                                          self.active_window_titles(target_browser, tab))
+                self.broadcast_patch(self.record_visit(tab, ACTIVATE_WEIGHT))
+        elif data["type"] == "activate_ack":
+            # The owning extension finished chrome.tabs.update for a relayed activation
+            result = self.activations.ack(data.get("requestId"), data.get("ok", True))
+            if result is not None:
+                route, requester, latency_ms = result
+                print(f"[PERF] Activation via {route}: {latency_ms:.1f}ms click to ack (ok: {data.get('ok', True)})")
+                if requester is not None:
+                    self.send(requester, {
+                        "type": "activate_result",
+                        "tabId": data.get("tabId"),
+                        "browser": route,
+                        "ok": data.get("ok", True),
+                        "error": data.get("error"),
+                        "latencyMs": round(latency_ms, 2)
+                    })
+        elif data["type"] == "stats":
+            self.send(websocket, {
+                "type": "stats",
+                "queues": self.queue_stats(),
+                "focus": self.focus_worker.stats(),
+                "windows": window_registry.stats(),
+                "activations": self.activations.stats(),
+                "prefetch": self.prefetcher.stats() if self.prefetcher is not None else None,
+                "viewports": [{"browser": viewport.browser, "query": viewport.query, "offset": viewport.offset,
+                               "limit": viewport.limit, "updates": viewport.updates}
+                              for viewport in self.viewports.values()]
+            })
 
     async def handler(self, websocket):
         try:
@@ -367,6 +946,11 @@ class TabWebSocketServer:
 
     async def start_server(self, host="localhost", port=8765):
         print(f"Attempting to start WebSocket server on {host}:{port}")
+        # Icon analyses finish on worker threads and come back through the loop
+        self.loop = asyncio.get_running_loop()
+        self.favicon_store = get_favicon_store()
+        self.favicon_store.add_listener(self)
+        self.prefetcher = FaviconPrefetcher(self.favicon_store, self.store, self.frecency)
         try:
             server = await websockets.serve(
                 self.handler, 
@@ -374,6 +958,8 @@ class TabWebSocketServer:
                 port, 
                 ping_interval=None,
                 ping_timeout=None,
+                extensions=[deflate_extension()],
+                compression=None,  # Replaced by the tuned deflate extension above
                 logger=None  # Disable internal websockets logger
             )
             print(f"WebSocket server successfully started at ws://{host}:{port}")
@@ -382,4 +968,8 @@ class TabWebSocketServer:
         except Exception as e:
             print(f"Failed to start WebSocket server: {e}")
             self.logger.error(f"Failed to start WebSocket server: {e}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            self.focus_worker.stop()
+            if self.prefetcher is not None:
+                self.prefetcher.stop()
\ No newline at end of file
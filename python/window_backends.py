@@ -0,0 +1,299 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+class WindowBackend(ABC):
+    """Platform interface for finding and focusing top-level windows.
+
+    Window handles are opaque to callers; they only ever come from
+    enumerate_windows() and go back into is_window_valid() / focus_window().
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def enumerate_windows(self):
+        """Visible top-level windows with a title, front-most first, as (hwnd, title, class, pid)"""
+
+    @abstractmethod
+    def is_window_valid(self, hwnd, pid):
+        """Cheap check that hwnd still exists, is visible and still belongs to pid"""
+
+    @abstractmethod
+    def focus_window(self, hwnd):
+        """Restore if minimized and bring to the foreground; returns True on success"""
+
+    @abstractmethod
+    def window_title(self, hwnd):
+        """Current title of hwnd, or '' if it has none"""
+
+class NullBackend(WindowBackend):
+    """No windows to find: the default where there is no native backend.
+
+    Every lookup comes back empty, so activation reports that no browser
+    window was found instead of pretending to focus one.
+    """
+
+    name = 'none'
+
+    def enumerate_windows(self):
+        return []
+
+    def is_window_valid(self, hwnd, pid):
+        return False
+
+    def focus_window(self, hwnd):
+        return False
+
+    def window_title(self, hwnd):
+        return ''
+
+class Win32Backend(WindowBackend):
+    """The real thing: user32 via ctypes. Only constructible on Windows."""
+
+    name = 'win32'
+
+    # Windows API constants
+    SW_RESTORE = 9
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        user32 = self.user32 = ctypes.windll.user32
+
+        # Define callback function type for EnumWindows
+        self.WNDENUMPROC = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+
+        # Windows API function definitions
+        user32.SetForegroundWindow.argtypes = [wintypes.HWND]
+        user32.SetForegroundWindow.restype = wintypes.BOOL
+        user32.ShowWindow.argtypes = [wintypes.HWND, ctypes.c_int]
+        user32.ShowWindow.restype = wintypes.BOOL
+        user32.IsIconic.argtypes = [wintypes.HWND]
+        user32.IsIconic.restype = wintypes.BOOL
+        user32.IsWindowVisible.argtypes = [wintypes.HWND]
+        user32.IsWindowVisible.restype = wintypes.BOOL
+        user32.IsWindow.argtypes = [wintypes.HWND]
+        user32.IsWindow.restype = wintypes.BOOL
+        user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, wintypes.LPDWORD]
+        user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+        user32.EnumWindows.argtypes = [self.WNDENUMPROC, wintypes.LPARAM]
+        user32.EnumWindows.restype = wintypes.BOOL
+        user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+        user32.GetWindowTextLengthW.restype = ctypes.c_int
+        user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        user32.GetWindowTextW.restype = ctypes.c_int
+        user32.GetClassNameW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        user32.GetClassNameW.restype = ctypes.c_int
+        user32.BringWindowToTop.argtypes = [wintypes.HWND]
+        user32.BringWindowToTop.restype = wintypes.BOOL
+
+    def _window_pid(self, hwnd):
+        window_pid = self._wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(hwnd, self._ctypes.byref(window_pid))
+        return window_pid.value
+
+    def window_title(self, hwnd):
+        title_length = self.user32.GetWindowTextLengthW(hwnd)
+        if title_length == 0:
+            return ''
+        title_buffer = self._ctypes.create_unicode_buffer(title_length + 1)
+        self.user32.GetWindowTextW(hwnd, title_buffer, title_length + 1)
+        return title_buffer.value
+
+    def _window_class(self, hwnd):
+        class_buffer = self._ctypes.create_unicode_buffer(256)
+        self.user32.GetClassNameW(hwnd, class_buffer, 256)
+        return class_buffer.value
+
+    def enumerate_windows(self):
+        windows = []
+
+        def enum_windows_callback(hwnd, lParam):
+            if not self.user32.IsWindowVisible(hwnd):
+                return True
+            title = self.window_title(hwnd)
+            if title:
+                windows.append((hwnd, title, self._window_class(hwnd), self._window_pid(hwnd)))
+            return True
+
+        self.user32.EnumWindows(self.WNDENUMPROC(enum_windows_callback), 0)
+        return windows
+
+    def is_window_valid(self, hwnd, pid):
+        return bool(self.user32.IsWindow(hwnd) and self.user32.IsWindowVisible(hwnd)
+                    and self._window_pid(hwnd) == pid)
+
+    def focus_window(self, hwnd):
+        if self.user32.IsIconic(hwnd):
+            self.user32.ShowWindow(hwnd, self.SW_RESTORE)
+        focused = self.user32.SetForegroundWindow(hwnd)
+        self.user32.BringWindowToTop(hwnd)
+        return bool(focused)
+
+def _delay(seconds):
+    """Sleep for simulated latencies; busy-wait below a millisecond where sleep() is too coarse"""
+    if seconds <= 0:
+        return
+    if seconds >= 0.001:
+        time.sleep(seconds)
+        return
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class SimulatedBackend(WindowBackend):
+    """In-memory desktop for headless runs, load tests and benchmarks.
+
+    browser_windows maps a browser name to how many of its windows exist;
+    other_windows adds unrelated windows that enumeration has to skip. The
+    latencies model what the matching user32 calls cost, per window for
+    enumeration and per call otherwise.
+    """
+
+    name = 'simulated'
+
+    # Title suffix and window class per browser, as the real browsers use them
+    BROWSER_WINDOWS = {
+        'Chrome': ('Google Chrome', 'Chrome_WidgetWin_1'),
+        'Firefox': ('Mozilla Firefox', 'MozillaWindowClass'),
+        'Brave': ('Brave', 'Chrome_WidgetWin_1'),
+        'Opera': ('Opera', 'Chrome_WidgetWin_1'),
+        'Opera GX': ('Opera GX', 'Chrome_WidgetWin_1'),
+        'Edge': ('Microsoft Edge', 'Chrome_WidgetWin_1'),
+    }
+
+    def __init__(self, browser_windows=None, other_windows=50,
+                 enumerate_latency=0.00002, check_latency=0.000005, focus_latency=0.002):
+        self.enumerate_latency = enumerate_latency
+        self.check_latency = check_latency
+        self.focus_latency = focus_latency
+        self._lock = threading.Lock()
+        # hwnd -> [title, class, pid]; dict order is z-order, front-most first
+        self._windows = {}
+        self._next_hwnd = 0x10000
+        self.foreground = None
+        self.enumerations = 0
+        self.focus_calls = 0
+        for browser, count in (browser_windows or {'Chrome': 2, 'Firefox': 1, 'Edge': 1}).items():
+            for index in range(count):
+                self.open_window(browser, f"Tab {index}")
+        for index in range(other_windows):
+            self.open_window(None, f"Document {index} - Editor")
+
+    def open_window(self, browser, title, pid=None):
+        """Add a window on top of the z-order and return its handle"""
+        if browser is None:
+            full_title, window_class = title, 'EditorWindowClass'
+        else:
+            suffix, window_class = self.BROWSER_WINDOWS.get(browser, (browser, browser))
+            full_title = f"{title} - {suffix}"
+        with self._lock:
+            hwnd = self._next_hwnd
+            self._next_hwnd += 4
+            pid = pid if pid is not None else 1000 + len(self._windows)
+            self._windows = {hwnd: [full_title, window_class, pid], **self._windows}
+        return hwnd
+
+    def close_window(self, hwnd):
+        with self._lock:
+            self._windows.pop(hwnd, None)
+
+    def set_title(self, hwnd, title):
+        with self._lock:
+            if hwnd in self._windows:
+                self._windows[hwnd][0] = title
+
+    def window_title(self, hwnd):
+        _delay(self.check_latency)
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window[0] if window else ''
+
+    def enumerate_windows(self):
+        with self._lock:
+            windows = [(hwnd, title, window_class, pid) for hwnd, (title, window_class, pid) in self._windows.items()]
+        _delay(self.enumerate_latency * len(windows))
+        self.enumerations += 1
+        return windows
+
+    def is_window_valid(self, hwnd, pid):
+        _delay(self.check_latency)
+        with self._lock:
+            window = self._windows.get(hwnd)
+        return window is not None and window[2] == pid
+
+    def focus_window(self, hwnd):
+        _delay(self.focus_latency)
+        with self._lock:
+            window = self._windows.pop(hwnd, None)
+            if window is None:
+                return False
+            self._windows = {hwnd: window, **self._windows}
+        self.foreground = hwnd
+        self.focus_calls += 1
+        return True
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name=None):
+    """Build a backend by name; FINDYOURTAB_WINDOW_BACKEND picks one, else by platform.
+
+    Off Windows the default is NullBackend; the simulated desktop is only
+    used when asked for, so a misconfigured host fails visibly.
+    """
+    name = name or os.environ.get('FINDYOURTAB_WINDOW_BACKEND') or ('win32' if sys.platform == 'win32' else 'none')
+    if name == 'win32':
+        return Win32Backend()
+    if name == 'none':
+        return NullBackend()
+    if name == 'simulated':
+        return SimulatedBackend()
+    raise ValueError(f"Unknown window backend: {name}")
+
+def get_window_backend():
+    """The process-wide backend, created on first use so importing never touches user32"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+                print(f"[PERF] Using {_backend.name} window backend")
+    return _backend
+
+def set_window_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,123 @@
+"""
+MIT License
+
+Copyright (c) 2025 whybirdslie (FindYourTab)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+Any modifications or contributions to this software must maintain attribution to the original author (whybirdslie) and share credit for the work.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+# Optional faster/compact encoders - the server works with plain json alone
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+class StdlibJsonCodec:
+    """Plain JSON text frames via the standard library"""
+    name = 'json'
+    binary = False
+
+    def encode(self, message):
+        return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+    def decode(self, frame):
+        return json.loads(frame)
+
+class OrjsonCodec:
+    """Same JSON text frames as StdlibJsonCodec, encoded and parsed by orjson"""
+    name = 'json'
+    binary = False
+
+    def encode(self, message):
+        return orjson.dumps(message).decode('utf-8')
+
+    def decode(self, frame):
+        return orjson.loads(frame)
+
+class MsgpackCodec:
+    """Compact binary frames for clients that can decode MessagePack"""
+    name = 'msgpack'
+    binary = True
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame, raw=False)
+
+# JSON is always available; orjson only changes how fast it is produced
+JSON_CODEC = OrjsonCodec() if orjson is not None else StdlibJsonCodec()
+
+CODECS = {JSON_CODEC.name: JSON_CODEC}
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+# permessage-deflate tuning (compare settings with `python benchmark.py codecs`).
+# Snapshots repeat the same URLs, hosts and keys across the whole frame, so a
+# 32 KiB window with the default level finds noticeably more matches than the
+# websockets default (4 KiB window, memLevel 5) for a little more CPU time.
+# There are only ever a handful of local clients, so the larger per-connection
+# zlib state is not a concern.
+DEFLATE_WINDOW_BITS = 15
+DEFLATE_COMPRESS_SETTINGS = {"level": 6, "memLevel": 8}
+
+def deflate_extension():
+    return ServerPerMessageDeflateFactory(
+        server_max_window_bits=DEFLATE_WINDOW_BITS,
+        compress_settings=DEFLATE_COMPRESS_SETTINGS,
+    )
+
+def negotiate_codec(offered):
+    """Pick the first codec the client offered that this server supports, else JSON"""
+    for name in offered or ():
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_CODEC
+
+def decode_frame(frame, codec=JSON_CODEC):
+    """Text frames are always JSON; binary frames use the client's negotiated codec"""
+    if isinstance(frame, (bytes, bytearray)) and codec.binary:
+        return codec.decode(frame)
+    return JSON_CODEC.decode(frame)
+
+class OutgoingMessage:
+    """A message encoded lazily and at most once per codec, however many clients get it"""
+
+    __slots__ = ('message', '_frames')
+
+    def __init__(self, message):
+        self.message = message
+        self._frames = {}
+
+    def frame(self, codec):
+        encoded = self._frames.get(codec.name)
+        if encoded is None:
+            encoded = self._frames[codec.name] = codec.encode(self.message)
+        return encoded
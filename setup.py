@@ -9,6 +9,10 @@ setup(
         'websockets',
         'keyboard'
     ],
+    extras_require={
+        # Faster JSON frames and the binary msgpack codec (see python/wire_codecs.py)
+        'codecs': ['orjson', 'msgpack'],
+    },
     package_data={
         'findyourtab': ['static/*'],
     },